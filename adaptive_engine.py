@@ -0,0 +1,496 @@
+# Adaptive practice engine
+#
+# Data structures and Bloom progression behind show_practice().  QuestionIndex
+# and ConceptGraph hold no learner state so one instance is shared by every
+# session in a process; LearnerState is per learner.
+# Nothing here imports Streamlit: learner state is passed in and updated in
+# place, so the engine can be driven headless (see benchmark_engine.py).
+#
+# Concepts and questions are interned to their position in the graph / bank,
+# so a learner's state is a handful of small arrays rather than dicts keyed by
+# strings.
+import hashlib
+import heapq
+import struct
+from array import array
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from redirection_map import SERVE
+
+
+class KnowledgeGraphError(ValueError):
+    pass
+
+
+def fingerprint(items):
+    # 8-byte digest of ordered ids.  Snapshots store positions, so they carry
+    # the fingerprint of the content they index and are refused by any other.
+    return hashlib.blake2b("\x1f".join(items).encode(), digest_size=8).digest()
+
+
+# -------------------- Question Index -------------------- #
+class QuestionIndex:
+    def __init__(self, bank):
+        self.questions = list(bank)
+        self.by_id = {}
+        self.position = {}
+        self.bucket_ids = {}
+        self.buckets = []
+        for i, q in enumerate(self.questions):
+            self.by_id[q["question_id"]] = q
+            self.position[q["question_id"]] = i
+            key = (q["concept_tag"], q["bloom_level"])
+            if key not in self.bucket_ids:
+                self.bucket_ids[key] = len(self.buckets)
+                self.buckets.append([])
+            self.buckets[self.bucket_ids[key]].append(i)
+        # Answers are stored as option positions, so the options count too
+        self.fingerprint = fingerprint(
+            part for q in self.questions for part in (q["question_id"], *q["options"])
+        )
+
+    def __len__(self):
+        return len(self.questions)
+
+    def next_unanswered(self, concept, level, answered):
+        # Bank order within a (concept, level) bucket is preserved.  The
+        # learner's cursor only moves forward because answers are never
+        # removed, so each question is skipped at most once: O(1) amortised.
+        bucket_id = self.bucket_ids.get((concept, level))
+        if bucket_id is None:
+            return None
+        bucket = self.buckets[bucket_id]
+        i = answered.cursors[bucket_id]
+        while i < len(bucket) and answered.seen[bucket[i]]:
+            i += 1
+        answered.cursors[bucket_id] = i
+        return self.questions[bucket[i]] if i < len(bucket) else None
+
+
+# Per-learner answered flags (one byte per question) plus a scan cursor per bucket
+class AnsweredQuestions:
+    __slots__ = ("index", "seen", "cursors")
+
+    def __init__(self, index):
+        self.index = index
+        self.seen = bytearray(len(index))
+        self.cursors = array("H", bytes(2 * len(index.buckets)))
+
+    def __contains__(self, question_id):
+        return bool(self.seen[self.index.position[question_id]])
+
+    def __len__(self):
+        return sum(self.seen)
+
+    def add(self, question_id):
+        self.seen[self.index.position[question_id]] = 1
+
+
+# -------------------- Concept Graph -------------------- #
+class ConceptGraph:
+    def __init__(self, graph):
+        self.graph = graph
+        self.concepts = list(graph)
+        self.position = {concept: i for i, concept in enumerate(self.concepts)}
+        self.prerequisites = {}
+        self.dependents = {concept: [] for concept in self.concepts}
+        for concept, data in graph.items():
+            prerequisites = tuple(data["prerequisite"])
+            for prereq in prerequisites:
+                if prereq not in graph:
+                    raise KnowledgeGraphError(f"'{concept}' lists unknown prerequisite '{prereq}'")
+                self.dependents[prereq].append(concept)
+            self.prerequisites[concept] = prerequisites
+        # Positional copies for the per-learner arrays
+        self.prerequisite_ids = [tuple(self.position[p] for p in self.prerequisites[c]) for c in self.concepts]
+        self.dependent_ids = [tuple(self.position[d] for d in self.dependents[c]) for c in self.concepts]
+        self.topological_order = self._topological_order()
+        self.fingerprint = fingerprint(self.concepts)
+
+    def _topological_order(self):
+        # Kahn's algorithm; ties are broken by declaration order
+        missing = {concept: len(p) for concept, p in self.prerequisites.items()}
+        ready = [self.position[c] for c, n in missing.items() if n == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            concept = self.concepts[heapq.heappop(ready)]
+            order.append(concept)
+            for dependent in self.dependents[concept]:
+                missing[dependent] -= 1
+                if missing[dependent] == 0:
+                    heapq.heappush(ready, self.position[dependent])
+        if len(order) != len(self.concepts):
+            cycle = [c for c in self.concepts if missing[c] > 0]
+            raise KnowledgeGraphError(f"prerequisite cycle between: {', '.join(cycle)}")
+        return order
+
+    def __len__(self):
+        return len(self.concepts)
+
+    def __contains__(self, concept):
+        return concept in self.graph
+
+    def bloom_levels(self, concept):
+        return self.graph[concept]["bloom_levels"]
+
+
+# Per-learner set of concepts whose prerequisites are all mastered.  Mastering
+# or resetting a concept only touches its direct dependents, and the next
+# concept is the eligible one declared first, as in a full graph walk.
+class ConceptFrontier:
+    __slots__ = ("graph", "mastered", "missing", "_ready")
+
+    def __init__(self, concept_graph, mastered=()):
+        self.graph = concept_graph
+        self.mastered = bytearray(len(concept_graph))
+        self.missing = array("H", (len(p) for p in concept_graph.prerequisite_ids))
+        self._ready = [i for i, n in enumerate(self.missing) if n == 0]
+        heapq.heapify(self._ready)
+        mastered = set(mastered)
+        for concept in concept_graph.topological_order:
+            if concept in mastered:
+                self.master(concept)
+
+    def _eligible(self, i):
+        return not self.mastered[i] and self.missing[i] == 0
+
+    def next_concept(self):
+        # Entries invalidated by later master/reset calls are dropped lazily
+        while self._ready:
+            if self._eligible(self._ready[0]):
+                return self.graph.concepts[self._ready[0]]
+            heapq.heappop(self._ready)
+        return None
+
+    def eligible(self):
+        return [c for i, c in enumerate(self.graph.concepts) if self._eligible(i)]
+
+    def is_mastered(self, concept):
+        return bool(self.mastered[self.graph.position[concept]])
+
+    def master(self, concept):
+        i = self.graph.position[concept]
+        if self.mastered[i]:
+            return
+        self.mastered[i] = 1
+        for dependent in self.graph.dependent_ids[i]:
+            self.missing[dependent] -= 1
+            if self._eligible(dependent):
+                heapq.heappush(self._ready, dependent)
+
+    def reset(self, concept):
+        i = self.graph.position[concept]
+        if not self.mastered[i]:
+            return
+        self.mastered[i] = 0
+        if self._eligible(i):
+            heapq.heappush(self._ready, i)
+        for dependent in self.graph.dependent_ids[i]:
+            self.missing[dependent] += 1
+
+
+# -------------------- Bloom Progression -------------------- #
+BLOOM_ORDER = ("Prerequisite", "Remembering", "Understanding", "Applying", "Analyzing", "Evaluating", "Creating")
+_NEXT_BLOOM_LEVEL = dict(zip(BLOOM_ORDER, BLOOM_ORDER[1:]))
+_LEVEL_CODE = {level: i for i, level in enumerate(BLOOM_ORDER)}
+NO_LEVEL = 255
+INITIAL_LEVEL = "Remembering"
+
+
+def next_bloom_level(current):
+    return _NEXT_BLOOM_LEVEL.get(current)
+
+
+# Answers as (question position, option position, correct) triples
+class AnswerHistory:
+    __slots__ = ("questions", "answers", "correct")
+
+    def __init__(self):
+        self.questions = array("H")
+        self.answers = array("b")
+        self.correct = bytearray()
+
+    def __len__(self):
+        return len(self.correct)
+
+    def append(self, question, answer, correct):
+        self.questions.append(question)
+        self.answers.append(answer)
+        self.correct.append(1 if correct else 0)
+
+    def __iter__(self):
+        return zip(self.questions, self.answers, map(bool, self.correct))
+
+
+# Snapshot header: format version, concepts, questions, answers in history,
+# knowledge graph and question bank fingerprints
+_SNAPSHOT_HEADER = struct.Struct("<BHHI8s8s")
+_SNAPSHOT_VERSION = 2
+
+
+class LearnerState:
+    # Everything show_practice() keeps for one learner.  Reading a concept
+    # never creates an entry; unknown concepts raise KeyError.
+    __slots__ = ("graph", "index", "levels", "attempts", "frontier", "answered", "history")
+
+    def __init__(self, concept_graph, index):
+        n = len(concept_graph)
+        self.graph = concept_graph
+        self.index = index
+        self.levels = bytearray([_LEVEL_CODE[INITIAL_LEVEL]]) * n
+        self.attempts = array("H", bytes(2 * n))
+        self.frontier = ConceptFrontier(concept_graph)
+        self.answered = AnsweredQuestions(index)
+        self.history = AnswerHistory()
+
+    def level(self, concept):
+        code = self.levels[self.graph.position[concept]]
+        return None if code == NO_LEVEL else BLOOM_ORDER[code]
+
+    def set_level(self, concept, level):
+        self.levels[self.graph.position[concept]] = NO_LEVEL if level is None else _LEVEL_CODE[level]
+
+    def attempt_count(self, concept):
+        return self.attempts[self.graph.position[concept]]
+
+    def add_attempt(self, concept):
+        self.attempts[self.graph.position[concept]] += 1
+
+    def reset_attempts(self, concept):
+        self.attempts[self.graph.position[concept]] = 0
+
+    def started(self):
+        return any(self.attempts)
+
+    def is_mastered(self, concept):
+        return self.frontier.is_mastered(concept)
+
+    def next_concept(self):
+        return self.frontier.next_concept()
+
+    def record_answer(self, question, answer, correct):
+        options = question["options"]
+        self.history.append(
+            self.index.position[question["question_id"]],
+            options.index(answer) if answer in options else -1,
+            correct,
+        )
+
+    def history_entries(self):
+        # (question dict, answer text, correct) in answer order
+        for q, a, correct in self.history:
+            question = self.index.questions[q]
+            yield question, question["options"][a] if a >= 0 else None, correct
+
+    def mark(self):
+        # Copy of the per-concept columns, compared by changes_since()
+        return bytes(self.levels), array("H", self.attempts), bytes(self.frontier.mastered)
+
+    def changes_since(self, mark):
+        # [concept, level, attempts, mastered] for every concept that differs from the mark
+        levels, attempts, mastered = mark
+        return [
+            [concept, self.level(concept), self.attempts[i], bool(self.frontier.mastered[i])]
+            for i, concept in enumerate(self.graph.concepts)
+            if levels[i] != self.levels[i] or attempts[i] != self.attempts[i]
+            or mastered[i] != self.frontier.mastered[i]
+        ]
+
+    def apply_changes(self, changes):
+        for concept, level, attempts, mastered in changes:
+            self.set_level(concept, level)
+            self.attempts[self.graph.position[concept]] = attempts
+            update_mastery(self, concept, mastered)
+
+    # Compact binary snapshot; answered-question cursors are rebuilt lazily
+    def to_bytes(self):
+        history = self.history
+        return b"".join((
+            _SNAPSHOT_HEADER.pack(
+                _SNAPSHOT_VERSION, len(self.graph), len(self.index), len(history),
+                self.graph.fingerprint, self.index.fingerprint,
+            ),
+            self.levels, self.attempts.tobytes(), self.frontier.mastered, self.answered.seen,
+            history.questions.tobytes(), history.answers.tobytes(), history.correct,
+        ))
+
+    @classmethod
+    def from_bytes(cls, concept_graph, index, data):
+        if len(data) < _SNAPSHOT_HEADER.size or data[0] != _SNAPSHOT_VERSION:
+            raise ValueError("unsupported learner snapshot")
+        _, n, m, h, graph_print, index_print = _SNAPSHOT_HEADER.unpack_from(data)
+        if (n, graph_print) != (len(concept_graph), concept_graph.fingerprint) or \
+                (m, index_print) != (len(index), index.fingerprint):
+            raise ValueError("snapshot does not match the loaded knowledge graph / question bank")
+        view = memoryview(data)[_SNAPSHOT_HEADER.size:]
+        state = cls(concept_graph, index)
+        sizes = (n, 2 * n, n, m, 2 * h, h, h)
+        if len(view) != sum(sizes):
+            raise ValueError("truncated learner snapshot")
+        parts = []
+        for size in sizes:
+            parts.append(view[:size])
+            view = view[size:]
+        levels, attempts, mastered, seen, questions, answers, correct = parts
+        state.levels[:] = levels
+        state.attempts = array("H", attempts.tobytes())
+        state.frontier = ConceptFrontier(
+            concept_graph, [c for c, done in zip(concept_graph.concepts, mastered) if done]
+        )
+        state.answered.seen[:] = seen
+        state.history.questions.frombytes(questions)
+        state.history.answers.frombytes(answers)
+        state.history.correct[:] = correct
+        return state
+
+
+@lru_cache(maxsize=8)
+def _frame_positions(frames):
+    return {frame: i for i, frame in enumerate(frames)}, fingerprint(frames)
+
+
+# Per-learner completion flag and attempt count for each content frame
+class FrameLog:
+    __slots__ = ("position", "fingerprint", "completed", "attempts")
+
+    def __init__(self, frames):
+        self.position, self.fingerprint = _frame_positions(tuple(frames))
+        self.completed = bytearray(len(self.position))
+        self.attempts = array("H", bytes(2 * len(self.position)))
+
+    def complete(self, frame):
+        i = self.position[frame]
+        self.completed[i] = 1
+        self.attempts[i] += 1
+
+    def is_completed(self, frame):
+        return bool(self.completed[self.position[frame]])
+
+    def copy(self):
+        log = FrameLog.__new__(FrameLog)
+        log.position, log.fingerprint = self.position, self.fingerprint
+        log.completed = bytearray(self.completed)
+        log.attempts = array("H", self.attempts)
+        return log
+
+    def rebase(self, frames):
+        # The log for another frame list (a content update), keeping the
+        # progress of the frames both share; self when the frames are the same
+        position, frames_print = _frame_positions(tuple(frames))
+        if frames_print == self.fingerprint:
+            return self
+        log = FrameLog(frames)
+        for frame, i in self.position.items():
+            j = position.get(frame)
+            if j is not None:
+                log.completed[j] = self.completed[i]
+                log.attempts[j] = self.attempts[i]
+        return log
+
+    # Prefixed with the frames' fingerprint; frames are stored by position
+    def to_bytes(self):
+        return self.fingerprint + bytes(self.completed) + self.attempts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, frames, data):
+        log = cls(frames)
+        n, k = len(log.completed), len(log.fingerprint)
+        if len(data) != k + 3 * n or data[:k] != log.fingerprint:
+            raise ValueError("snapshot does not match the loaded frames")
+        log.completed[:] = data[k:k + n]
+        log.attempts = array("H", data[k + n:])
+        return log
+
+
+def update_mastery(state, concept, mastered):
+    # Returns True when the concept's mastery actually changed
+    changed = state.is_mastered(concept) != mastered
+    if mastered:
+        state.frontier.master(concept)
+    else:
+        state.frontier.reset(concept)
+    return changed
+
+
+def _set_mastered(state, concept, mastered, on_mastery):
+    if update_mastery(state, concept, mastered) and on_mastery:
+        on_mastery(concept, mastered)
+
+
+def choose_question(state, on_mastery=None):
+    # Next question for the first eligible concept, starting at the learner's
+    # current Bloom level.  A concept with no unanswered question left at or
+    # above that level is mastered and None is returned for this call.
+    concept = state.next_concept()
+    if concept is None:
+        return None
+
+    current_level = state.level(concept)
+    bloom_levels = state.graph.bloom_levels(concept)
+    if current_level not in bloom_levels:
+        current_level = bloom_levels[0]
+        state.set_level(concept, current_level)
+
+    levels_to_try = bloom_levels[bloom_levels.index(current_level):]
+    for level in levels_to_try:
+        question = state.index.next_unanswered(concept, level, state.answered)
+        if question:
+            return question
+
+    _set_mastered(state, concept, True, on_mastery)
+    state.set_level(concept, None)
+    return None
+
+
+class AnswerOutcome(NamedTuple):
+    correct: bool
+    mastered: bool = False
+    redirected_to: Optional[str] = None
+    has_prerequisites: bool = True
+    serve: Optional[str] = None  # follow-up question id from the redirection map
+
+
+def apply_answer(state, question, is_correct, on_mastery=None, redirect=None):
+    # Correct answers move the concept up one Bloom level (mastering it past
+    # the last one); wrong answers send the learner back to the first
+    # prerequisite they have not mastered.
+    # redirect is the question's redirection map entry (the adaptive scripts).
+    # With one, progress only moves when the map serves a follow-up question
+    # for the outcome, and a wrong answer starts the concept over instead.
+    concept = question["concept_tag"]
+    state.add_attempt(concept)
+    state.answered.add(question["question_id"])
+    prerequisites = state.graph.prerequisites[concept]
+
+    serve = None
+    if redirect is not None:
+        action = redirect.if_correct if is_correct else redirect.if_incorrect
+        serve = action.question_id if action is not None and action.kind == SERVE else None
+        if serve is None:
+            return AnswerOutcome(is_correct, has_prerequisites=bool(prerequisites))
+
+    if is_correct:
+        next_level = next_bloom_level(question["bloom_level"])
+        if next_level:
+            state.set_level(concept, next_level)
+            return AnswerOutcome(True, serve=serve)
+        _set_mastered(state, concept, True, on_mastery)
+        state.set_level(concept, None)
+        return AnswerOutcome(True, mastered=True, serve=serve)
+
+    if not prerequisites:
+        return AnswerOutcome(False, has_prerequisites=False, serve=serve)
+    if serve is not None:
+        state.set_level(concept, None)
+        state.reset_attempts(concept)
+        _set_mastered(state, concept, False, on_mastery)
+        return AnswerOutcome(False, redirected_to=prerequisites[0], serve=serve)
+    for prereq in prerequisites:
+        if not state.is_mastered(prereq):
+            state.set_level(prereq, INITIAL_LEVEL)
+            state.set_level(concept, None)
+            _set_mastered(state, concept, False, on_mastery)
+            return AnswerOutcome(False, redirected_to=prereq)
+    return AnswerOutcome(False)
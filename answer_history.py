@@ -0,0 +1,66 @@
+# Paged answer history for the practice pages
+#
+# The Progress & History tab shows a learner's answers newest first, one page
+# of HISTORY_PAGE_SIZE at a time, filtered by result and concept.  The
+# filtering and paging are done by the history's owner (in SQL by
+# EventStore.practice_history() in the event-store scripts), so a rerun
+# sends one markdown element for the visible page however long the history
+# grows.
+import math
+import os
+
+import streamlit as st
+
+from instrumentation import timed
+
+HISTORY_PAGE_SIZE = int(os.environ.get("BPI_HISTORY_PAGE_SIZE", "10"))
+RESULTS = {"All answers": None, "✅ Correct": True, "❌ Incorrect": False}
+ALL_CONCEPTS = "All concepts"
+
+
+def event_history(db, name, question_index):
+    # fetch() for show_answer_history() over the learner's practice events
+    def fetch(correct, concept, limit, offset):
+        page = db.practice_history(name, correct, concept, limit, offset)
+        entries = []
+        for doc in page.entries:
+            question = question_index.by_id.get(doc.get("question_id"))
+            entries.append((question["text"] if question else doc.get("question_id"), doc.get("answer"), doc.get("correct")))
+        return entries, page.total
+    return fetch
+
+
+def _first_page():
+    st.session_state.history_page = 1
+
+
+@timed()
+def show_answer_history(fetch, concepts, page_size=HISTORY_PAGE_SIZE):
+    # fetch(correct, concept, limit, offset) -> ((question text, answer, correct) entries, total)
+    col1, col2 = st.columns(2)
+    result = col1.selectbox("Result", list(RESULTS), key="history_result", on_change=_first_page)
+    concept = col2.selectbox(
+        "Concept", [ALL_CONCEPTS, *concepts], key="history_concept", on_change=_first_page
+    )
+    correct, concept = RESULTS[result], None if concept == ALL_CONCEPTS else concept
+
+    page = st.session_state.get("history_page", 1)
+    entries, total = fetch(correct, concept, page_size, (page - 1) * page_size)
+    pages = max(math.ceil(total / page_size), 1)
+    if page > pages:
+        # The history shrank under the selected page (a new practice round)
+        page = st.session_state.history_page = pages
+        entries, total = fetch(correct, concept, page_size, (page - 1) * page_size)
+    if not total:
+        st.info("No answers to show yet." if correct is None and concept is None else "No answers match these filters.")
+        return
+
+    st.markdown("\n\n".join(
+        f"**Q:** {text}  \n**Your Answer:** {answer} {'✅' if is_correct else '❌'}"
+        for text, answer, is_correct in entries
+    ))
+    first = (page - 1) * page_size + 1
+    col1, col2 = st.columns([3, 1])
+    col1.caption(f"Answers {first}–{first + len(entries) - 1} of {total}, newest first")
+    if pages > 1:
+        col2.number_input("Page", min_value=1, max_value=pages, key="history_page")
@@ -1,21 +1,53 @@
 import streamlit as st
 import pandas as pd
-import re
 
-from collections import defaultdict
-import networkx as nx
-import matplotlib.pyplot as plt
-import time
-
-from tinydb import TinyDB, Query
-from tinydb.storages import MemoryStorage
 from datetime import datetime
 
+from content_bundle import COMPLETE, CONTENT_PATH, load_frames, validate_frames
+from content_watcher import ContentWatcher
+from frame_graph import FrameGraph, link_hints
+from instrumentation import span, timed, start_rerun, start_exporters, show_timings
+from event_store import EventStore
+from learner_sessions import LearnerSessions, START_FRAME
+from answer_history import event_history, show_answer_history
+from practice_content import KNOWLEDGE_GRAPH_PATH, QUESTION_BANK_PATH, load_knowledge_graph, load_question_bank
+from knowledge_graph_plot import show_knowledge_graph, progress_chart_png
+from practice_feedback import start_feedback, show_feedback
+from teacher_dashboard import show_teacher_dashboard
+from adaptive_engine import (
+    QuestionIndex, ConceptGraph, LearnerState, choose_question, apply_answer,
+)
+
 # Hide sidebar, menu, and footer
 st.set_page_config(page_title="BPI Learning",layout="wide", initial_sidebar_state="collapsed")
 
-if "db" not in st.session_state:
-    st.session_state.db = TinyDB(storage=MemoryStorage)
+# Per-span timings for this rerun; see instrumentation.py for the exporters
+start_rerun()
+start_exporters()
+
+@st.cache_resource
+def get_event_store():
+    # One durable store per process, shared by every session
+    return EventStore()
+
+db = get_event_store()
+
+@st.cache_resource
+def get_learner_sessions():
+    # Snapshot + event-log restore against this script's graph, bank and frames
+    return LearnerSessions(db, load_concept_graph(), load_question_index(), load_frame_graph)
+
+def save_session(force=False):
+    # Snapshots the learner once enough events have been logged since the last one
+    get_learner_sessions().checkpoint(
+        st.session_state.name,
+        st.session_state.get("current_frame", START_FRAME),
+        st.session_state.get("learner"),
+        st.session_state.get("learning_log"),
+        force=force,
+        # A checked answer waiting for "Next"
+        answered=st.session_state.get("selected_option") if st.session_state.get("show_feedback") else None,
+    )
 
 st.markdown("""
     <style>
@@ -29,7 +61,34 @@ if "page" not in st.session_state:
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
 
+PAGES = ("home", "frame", "practice")
+
+def start_session(name, age, gender, page="home"):
+    st.session_state.logged_in = True
+    st.session_state.name = name
+    st.session_state.age = age
+    st.session_state.gender = gender
+    st.session_state.page = page
+    # Pick up where the learner left off, even after a reconnect or restart
+    session = get_learner_sessions().restore(name)
+    st.session_state.current_frame = session.current_frame
+    st.session_state.learner = session.learner
+    st.query_params["learner"] = name
+
+def resume_from_url():
+    # Workers share no session state, so a reconnect routed to another worker
+    # starts empty; the learner and page in the URL are enough to rebuild it.
+    name = st.query_params.get("learner")
+    if st.session_state.logged_in or not name:
+        return
+    last_login = db.last_event(name, "login")
+    if last_login is None:
+        return
+    page = st.query_params.get("page")
+    start_session(name, last_login["age"], last_login["gender"], page if page in PAGES else "home")
+
 # Login Page
+@timed()
 def show_login():
     st.title("🎓 Student Login")
     with st.form("login_form"):
@@ -38,12 +97,8 @@ def show_login():
         gender = st.selectbox("Select your gender", ["Male", "Female", "Other"])
         submitted = st.form_submit_button("Login")
         if submitted and name.strip():
-            st.session_state.logged_in = True
-            st.session_state.name = name
-            st.session_state.age = age
-            st.session_state.gender = gender
-            st.session_state.page = "home"
-            st.session_state.db.insert({
+            start_session(name, age, gender)
+            db.insert({
                 "event": "login",
                 "name": name,
                 "age": age,
@@ -51,8 +106,12 @@ def show_login():
                 "timestamp": datetime.now().isoformat()
             })
             st.rerun()
+    if st.button("📊 Teacher Dashboard"):
+        st.session_state.page = "teacher"
+        st.rerun()
 
 # Home Page
+@timed()
 def show_home():
     st.title("🏠 Welcome to Braching Programmed Instruction based learning")
     name = st.session_state.get("name", "Student")
@@ -60,10 +119,9 @@ def show_home():
 
     with tab1:
         st.markdown(f"Hello **{name}**, here is your learning journey:")
-        all_data = st.session_state.db.all()
-        responses = [r for r in all_data if r.get("event") == "response" and r.get("name") == name]
+        learner_progress = db.progress(name)
 
-        if not responses:
+        if not learner_progress.responses:
             st.info("You haven't started your learning path yet. Click below to begin.")
             if st.button("📘 Start Learning"):
                 st.session_state.page = "frame"
@@ -71,13 +129,11 @@ def show_home():
         else:
             # 🎯 Show progress bar
             # Count how many frames exist in the course
-            df = load_data()
-            main_frames = df[df["source"] == "Main_frame"].index.tolist()
+            main_frames = load_frame_graph().main_frames
             total_frames = len(main_frames)
 
-            # Count how many frames the student got correct
-            correct_frames = [r for r in responses if r["result"].lower() == "correct"]
-            completed_frames = len(set(r["frame"] for r in correct_frames))
+            # Frames the student got correct, maintained per response in the event store
+            completed_frames = learner_progress.completed_frames
 
             # ✅ Calculate progress (cap at 1.0)
             progress = min(completed_frames / total_frames, 1.0)
@@ -93,10 +149,8 @@ def show_home():
                 st.rerun()
     with tab2:
         st.markdown(f"Hello **{name}**, here is your practice:")
-        all_data = st.session_state.db.all()
-        responses = [r for r in all_data if r.get("event") == "response" and r.get("name") == name]
 
-        if not responses:
+        if not learner_progress.responses:
             st.info("You haven't started your learning path yet. Click below to begin.")
             if st.button("📝 Start Practicing"):
                 st.session_state.page = "practice"
@@ -105,12 +159,11 @@ def show_home():
             # 🎯 Show progress bar
             # Count how many frames exist in the course - to do
             #df = load_practice_data()
-            main_frames = df[df["source"] == "Main_frame"].index.tolist()
+            main_frames = load_frame_graph().main_frames
             total_frames = len(main_frames)
 
-            # Count how many frames the student got correct
-            correct_frames = [r for r in responses if r["result"].lower() == "correct"]
-            completed_frames = len(set(r["frame"] for r in correct_frames))
+            # Frames the student got correct, maintained per response in the event store
+            completed_frames = learner_progress.completed_frames
 
             # ✅ Calculate progress (cap at 1.0)
             progress = min(completed_frames / total_frames, 1.0)
@@ -124,6 +177,7 @@ def show_home():
 
 
 # Frame Page
+@timed()
 def show_frame():
     st.title("📖 Lets Get Started!")
     #change you are learning text color to green
@@ -149,31 +203,27 @@ def show_frame():
                 st.rerun()
     with col3:
         if st.button("Logout"):
+            save_session(force=True)
             st.session_state.page = "login"
             st.session_state.logged_in = False
+            st.query_params.clear()
             st.rerun()
 
-@st.cache_data
+@st.cache_resource
+def get_content():
+    # Edits to the workbook are rebuilt, validated and swapped in off-thread
+    return ContentWatcher([CONTENT_PATH], lambda: FrameGraph(validate_frames(load_frames(CONTENT_PATH))))
+
+def load_frame_graph():
+    # The frame graph currently being served; reruns look frames up in its dicts
+    return get_content().current
+
 def load_data():
-    df_main = pd.read_excel("branching_content.xlsx", sheet_name="Main_frame")
-    df_remedial = pd.read_excel("branching_content.xlsx", sheet_name="Remedial_frame")
-    df_main["source"] = "Main_frame"
-    df_remedial["source"] = "Remedial_frame"
-    df = pd.concat([df_main, df_remedial], ignore_index=True)
-    df.set_index("frame_name", inplace=True)
-    return df
-
-
-def parse_option(raw):
-    fields = {"ans": None, "result": None, "next_step": None, "feedback": None}
-    for key in fields.keys():
-        match = re.search(rf'{key}\s*[:=]\s*(.*?)(,|$)', raw, re.IGNORECASE | re.DOTALL)
-        if match:
-            fields[key] = match.group(1).strip(" \"{}")
-    return fields
+    # The frame table behind it, for the teacher dashboard
+    return get_content().current.frames
 
 def load_deafault_frame1():
-    df = load_data()
+    graph = load_frame_graph()
     # Init current frame
     if "current_frame" not in st.session_state:
         st.session_state.current_frame = "main_frame_1"
@@ -189,11 +239,23 @@ def load_deafault_frame1():
         st.session_state.remedial_frame = False
 
 
-    # Load current frame
-    row = df.loc[st.session_state.current_frame]
+    # Load current frame; a content update may have removed the learner's frame
+    if st.session_state.current_frame == COMPLETE:
+        st.success("🎉 Congratulations! You have completed all concepts.")
+        return
+    if st.session_state.current_frame not in graph:
+        st.warning("This lesson has been updated, so you are starting again from the first frame.")
+        st.session_state.current_frame = START_FRAME
+    row = graph.rows[st.session_state.current_frame]
+    # Warm the hosts of the frames the learner can go to from here
+    hints = link_hints(graph.prefetch.get(st.session_state.current_frame, ()))
+    if hints:
+        st.markdown(hints, unsafe_allow_html=True)
     col1, col2 = st.columns(2)
     with col1:
         st.title(row["frame_heading"])
+        if st.session_state.current_frame in graph.depth:
+            st.caption(f"🧭 {graph.depth[st.session_state.current_frame]} frame(s) left on this path")
         #display frame content with size 14 points
         st.markdown(f"<div style='font-size: 32px;'>{row['frame_content']}</div>", unsafe_allow_html=True)
     
@@ -226,46 +288,47 @@ def load_deafault_frame1():
         st.subheader("Question")
         st.markdown(f"<div style='font-size: 20px;'>{row['question']}</div>", unsafe_allow_html=True)
 
-        options_raw = [row["option_a"], row["option_b"], row["option_c"]]
-        parsed_options = [
-                            parse_option(row["option_a"]),
-                            parse_option(row["option_b"]),
-                            parse_option(row["option_c"]),
-                        ]
+        # Options are parsed and validated once when the content bundle is built
+        parsed_options = graph.options[st.session_state.current_frame]
 
         # Step 2: Extract just the answer labels for display
-        answer_labels = [opt["ans"] for opt in parsed_options]
+        answer_labels = [opt.ans for opt in parsed_options]
 
         selected_ans = st.radio("Choose an answer:", answer_labels)
         st.markdown("<br>", unsafe_allow_html=True)
-        # Step 4: Match selected answer with full option dict
+        # Step 4: Match selected answer with the full parsed option
         if st.button("Check Answer"):
-            matched = next((opt for opt in parsed_options if opt["ans"] == selected_ans), None)
+            matched = next((opt for opt in parsed_options if opt.ans == selected_ans), None)
             if matched:
                 st.session_state.selected_option = matched
-                st.session_state.feedback = matched["feedback"]
-                st.session_state.next_step = matched["next_step"]
-                st.session_state.db.insert({
+                st.session_state.feedback = matched.feedback
+                st.session_state.next_step = matched.next_step
+                db.insert({
                     "event": "response",
                     "name": st.session_state.name,
                     "frame": st.session_state.current_frame,
-                    "selected_answer": matched["ans"],
-                    "result": matched["result"],
-                    "feedback": matched["feedback"],
+                    "selected_answer": matched.ans,
+                    "result": matched.result,
+                    "feedback": matched.feedback,
                     "timestamp": datetime.now().isoformat()
                 })
-                if matched["result"].lower() == "correct":
+                if matched.is_correct:
                     st.success("✅ Correct!")
-                    st.info(f"💬 {matched['feedback']}")
+                    st.info(f"💬 {matched.feedback}")
                     st.session_state.show_feedback = True
                     st.session_state.in_remedial = False
                 else:
                     st.session_state.in_remedial = True
-                    st.session_state.remedial_frame = matched["next_step"]
+                    st.session_state.remedial_frame = matched.next_step
                     st.rerun()          
     
-    if st.session_state.show_feedback and st.session_state.selected_option["result"].lower() == "correct":
-        if st.button("➡️ Next"):
+    if st.session_state.show_feedback and st.session_state.selected_option.is_correct:
+        # Check if the current frame is the last frame
+        if st.session_state.next_step == COMPLETE or pd.isna(st.session_state.next_step):
+            st.success("🎉 Congratulations! You have completed all concepts.")
+        elif st.session_state.next_step not in graph:
+            st.error(f"Next frame '{st.session_state.next_step}' not found. Please contact support.")
+        elif st.button("➡️ Next"):
             st.session_state.current_frame = st.session_state.next_step
             st.session_state.show_feedback = False
             st.session_state.selected_option = None
@@ -273,25 +336,26 @@ def load_deafault_frame1():
             st.session_state.show_review = False
             st.rerun()
 
+@timed()
 def show_remedial():
-    df = load_data()
-    if not st.session_state.get("remedial_frame"):
+    graph = load_frame_graph()
+    if st.session_state.get("remedial_frame") not in graph:
         st.error("No remedial frame available.")
         return
     
-    row = df.loc[st.session_state.remedial_frame]
+    row = graph.rows[st.session_state.remedial_frame]
     st.title(row.get("frame_heading", "Remedial Frame"))
     st.write(row.get("frame_content", ""))
 
-    if st.session_state.get("selected_option") and st.session_state.selected_option.get("feedback"):
+    if st.session_state.get("selected_option") and st.session_state.selected_option.feedback:
         st.subheader("💬 Feedback")
-        st.info(st.session_state.selected_option["feedback"])
+        st.info(st.session_state.selected_option.feedback)
         
     if "next_step" in row and pd.notna(row["next_step"]):
         st.info(f"ℹ️ {row['next_step']}")
 
     if st.button("🔁 Return to Main Frame"):
-        main_id = "main_frame_" + st.session_state.current_frame.split("_")[-1]
+        main_id = graph.return_frame(st.session_state.remedial_frame, st.session_state.current_frame)
         st.session_state.in_remedial = False
         st.session_state.current_frame = main_id
         st.session_state.show_feedback = False
@@ -299,329 +363,138 @@ def show_remedial():
         st.session_state.remedial_frame = None
         st.rerun()
 
-def show_practice():
-    # -------------------- Knowledge Graph -------------------- #
-    knowledge_graph = {
-        "Living organisms":{
-            "prerequisite": [],
-            "bloom_levels": ["Prerequisite","Applying"]
-        },
-        "Unicellular organisms": {
-            "prerequisite": ["Living organisms"],
-            "bloom_levels": ["Remembering"]
-        },
-        "Multicellular organisms": {
-            "prerequisite": ["Living organisms"],
-            "bloom_levels": ["Remembering"]
-        },
-        "Life processes": {
-            "prerequisite": ["Living organisms"],
-            "bloom_levels": ["Understanding"]
-        },
-        "Movement in living organisms": {
-            "prerequisite": ["Life processes"],
-            "bloom_levels": ["Understanding", "Applying"]
-        },
-        "Metabolism": {
-            "prerequisite": ["Life processes"],
-            "bloom_levels": ["Prerequisite","Remembering", "Analyzing"]
-        },
-        "Metabolism in unicellular organisms"  : {  
-            "prerequisite": ["Metabolism"],
-            "bloom_levels": ["Remembering","Applying"]
-        },
-        "Metabolism in multicellular organisms": {
-            "prerequisite": ["Metabolism"],
-            "bloom_levels": ["Understanding"]
-        },
-    }
+# -------------------- Knowledge Graph -------------------- #
+@st.cache_resource
+def load_concept_graph():
+    # Validated (no cycles or unknown prerequisites) and topologically ordered once per process
+    return ConceptGraph(load_knowledge_graph(KNOWLEDGE_GRAPH_PATH))
+
 
-    # -------------------- Question Bank -------------------- #
-    question_bank = [{"question_id": "Q1", "text": "Which of the following is considered a sign of life?", "options": ["Being silent", "Molecular movement", "Being inanimate", "Staying still"], "correct_answer": "Molecular movement", "bloom_level": "Remembering", "concept_tag": "Unicellular organisms"},
-        {"question_id": "Q2", "text": "Which of the following is *not* a living thing?", "options": ["Dog", "Man", "Rock", "Cow"], "correct_answer": "Rock", "bloom_level": "Prerequisite", "concept_tag": "Living organisms"},
-        {"question_id": "Q3", "text": "Why is visible movement not always a reliable sign of life?", "options": ["Only large organisms show movement", "Some living beings are too small", "Some life processes occur at molecular levels", "Movement is not needed at all"], "correct_answer": "Some life processes occur at molecular levels", "bloom_level": "Understanding", "concept_tag": "Movement in living organisms"},
-        {"question_id": "Q4", "text": "A leafless tree stands still during winter. Which observation best supports that it is still alive?", "options": ["It is green in color", "It produces flowers immediately", "It continues cellular activities internally", "It sheds leaves every day"], "correct_answer": "It continues cellular activities internally", "bloom_level": "Applying", "concept_tag": "Living organisms"},
-        {"question_id": "Q5", "text": "Which life process helps organisms break down food to release energy?", "options": ["Excretion", "Nutrition", "Respiration", "Diffusion"], "correct_answer": "Respiration", "bloom_level": "Remembering", "concept_tag": "Metabolism"},
-        {"question_id": "Q6", "text": "What do living beings use to obtain energy?", "options": ["Dust", "Heat", "Food", "Water"], "correct_answer": "Food", "bloom_level": "Prerequisite", "concept_tag": "Metabolism"},
-        {"question_id": "Q7", "text": "Why do organisms need to constantly carry out life processes?", "options": ["To sleep better", "To prevent breakdown of body structures", "To show movement", "To make noise"], "correct_answer": "To prevent breakdown of body structures", "bloom_level": "Understanding", "concept_tag": "Life processes"},
-        {"question_id": "Q8", "text": "Which of these best explains the interdependence of respiration and nutrition?", "options": ["Respiration provides energy for making food", "Nutrition provides food which is broken down by respiration to release energy", "Nutrition and respiration are unrelated", "Respiration eliminates waste from food"], "correct_answer": "Nutrition provides food which is broken down by respiration to release energy", "bloom_level": "Analyzing", "concept_tag": "Metabolism"},
-        {"question_id": "Q9", "text": "What do unicellular organisms use for gas exchange?", "options": ["Blood vessels", "Heart", "Entire body surface", "Alveoli"], "correct_answer": "Entire body surface", "bloom_level": "Remembering", "concept_tag": "Metabolism in unicellular organisms"},
-        {"question_id": "Q10", "text": "Why do multicellular organisms require specialized transport systems?", "options": ["They cannot breathe", "Their body is large and complex", "They have more blood", "They do not grow"], "correct_answer": "Their body is large and complex", "bloom_level": "Understanding", "concept_tag": "Metabolism in multicellular organisms"},
-        {"question_id": "Q11", "text": "An amoeba absorbs oxygen directly through its surface, but a frog has lungs. Why is this difference important?", "options": ["Frogs don’t need oxygen", "Amoeba has lungs too", "Multicellular organisms need systems to reach internal cells", "Frogs live in water"], "correct_answer": "Multicellular organisms need systems to reach internal cells", "bloom_level": "Applying", "concept_tag": "Metabolism in unicellular organisms"}
-    ]
+# -------------------- Question Bank -------------------- #
+@st.cache_resource
+def load_question_index():
+    # Built once per process and shared by every session; the questions are read-only
+    return QuestionIndex(load_question_bank(QUESTION_BANK_PATH, load_concept_graph().graph))
 
+
+@timed()
+def show_practice():
     # -------------------- Learner Profile -------------------- #
-    if "learner_log" not in st.session_state:
-        st.session_state.learner_log = defaultdict(lambda: {"level": "Remembering", "attempts": 0, "mastered": False})
-    if "history" not in st.session_state:
-        st.session_state.history = []
-
-    # -------------------- Helper Functions -------------------- #
-    def next_bloom_level(current):
-        order = ["Prerequisite", "Remembering", "Understanding", "Applying","Analyzing","Evaluating", "Creating"]
-        try:
-            return order[order.index(current) + 1]
-        except (ValueError, IndexError):
-            return None
-
-    def get_next_concept(log, graph):
-        for concept, data in graph.items():
-            if not log[concept]["mastered"]:
-                if all(log[p]["mastered"] for p in data["prerequisite"]):
-                    return concept
-        return None
-
-    def choose_question(log, graph, bank):
-        eligible_concepts = [
-            concept for concept in graph
-            if not log[concept]["mastered"] and all(log[p]["mastered"] for p in graph[concept]["prerequisite"])
-        ]
-        if not eligible_concepts:
-            return None
-        concept = eligible_concepts[0]
-
-        current_level = log[concept]["level"]
-        bloom_levels = graph[concept]["bloom_levels"]
-        if current_level not in bloom_levels:
-            current_level = bloom_levels[0]
-            log[concept]["level"] = current_level
-
-        levels_to_try = bloom_levels[bloom_levels.index(current_level):]
-        for level in levels_to_try:
-            unanswered = [q for q in bank if q["concept_tag"] == concept and q["bloom_level"] == level and q["text"] not in [h["question"] for h in st.session_state.history]]
-            if unanswered:
-                return unanswered[0]
-
-        log[concept]["mastered"] = True
-        log[concept]["level"] = None
-        return None
-        concept = eligible_concepts[0]
-
-        # Ensure a valid level is set
-        current_level = log[concept]["level"]
-        bloom_levels = graph[concept]["bloom_levels"]
-        if current_level not in bloom_levels:
-            current_level = bloom_levels[0]
-            log[concept]["level"] = current_level
-
-        levels_to_try = bloom_levels[bloom_levels.index(current_level):]
-        for level in levels_to_try:
-            for q in bank:
-                if q["concept_tag"] == concept and q["bloom_level"] == level:
-                    return q
-        return None
-        current_level = log[concept]["level"]
-        levels_to_try = ["Remembering", "Understanding", "Applying"]
-        start_index = levels_to_try.index(current_level)
-        for level in levels_to_try[start_index:]:
-            for q in bank:
-                if q["concept_tag"] == concept and q["bloom_level"] == level:
-                    return q
-        return None
-        current_level = log[concept]["level"]
-        for q in bank:
-            if q["concept_tag"] == concept and q["bloom_level"] == current_level:
-                return q
-        return None
-
-    # -------------------- Graph Visualization -------------------- #
-    def plot_knowledge_graph(graph, learner_log, current_concept=None):
-        G = nx.DiGraph()
-        node_colors = []
-        labels = {}
-
-        # Helper function to split text into multiple lines
-        def split_text(text, max_length=15):
-            words = text.split()
-            lines = []
-            current_line = []
-            current_length = 0
-            for word in words:
-                if current_length + len(word) + 1 > max_length:
-                    lines.append(" ".join(current_line))
-                    current_line = [word]
-                    current_length = len(word)
-                else:
-                    current_line.append(word)
-                    current_length += len(word) + 1
-            if current_line:
-                lines.append(" ".join(current_line))
-            return "\n".join(lines)
-
-        # Add nodes and edges to the graph
-        for concept, data in graph.items():
-            G.add_node(concept)
-            for prereq in data["prerequisite"]:
-                if prereq in graph:  # Ensure the prerequisite is in the filtered graph
-                    G.add_edge(prereq, concept)
-            status = "✅" if learner_log[concept]["mastered"] else "🕗"
-            label_text = f"{concept} {status}"
-            labels[concept] = split_text(label_text)  # Split label into multiple lines
-            if concept == current_concept:
-                node_colors.append("gold")
-            elif learner_log[concept]["mastered"]:
-                node_colors.append("lightgreen")
-            else:
-                node_colors.append("lightcoral")
-
-        # Ensure node_colors matches the number of nodes in the graph
-        if len(node_colors) != len(G.nodes):
-            raise ValueError(f"Mismatch: node_colors has {len(node_colors)} elements, but graph has {len(G.nodes)} nodes.")
-
-        # Adjust font size dynamically based on the length of the longest label
-        max_label_length = max(len(label.replace("\n", "")) for label in labels.values())
-        font_size = max(6, 8 - (max_label_length // 10))  # Reduce font size for longer labels
-
-        pos = nx.spring_layout(G, scale=1.5)  # Adjust scale for smaller layout
-        fig, ax = plt.subplots(figsize=(8, 6))  # Reduce figure size
-        nx.draw(
-            G,
-            pos,
-            labels=labels,
-            node_color=node_colors,
-            node_size=1500,  # Reduce node size
-            font_size=font_size,  # Use dynamically calculated font size
-            ax=ax
-        )
-        st.pyplot(fig)
+    concept_graph = load_concept_graph()
+    knowledge_graph = concept_graph.graph
+    question_index = load_question_index()
+    if "learner" not in st.session_state:
+        st.session_state.learner = LearnerState(concept_graph, question_index)
+    learner = st.session_state.learner
+
+    def record_mastery(concept, mastered):
+        # Mastery changes feed the per-learner progress aggregate in the event store
+        db.insert({
+            "event": "mastery",
+            "name": st.session_state.name,
+            "concept": concept,
+            "mastered": mastered,
+            "timestamp": datetime.now().isoformat()
+        })
 
     # -------------------- UI -------------------- #
     st.title("🤖 Adaptive Practice with Knowledge Graph")
     st.markdown("Get concept-based questions that adapt to your progress.")
 
-    tabs = st.tabs(["📖 Practice", "📌 Concept Graph", "📊 Progress & History"])
+    # Only the selected tab runs; switching tabs reruns the page
+    tabs = st.tabs(["📖 Practice", "📌 Concept Graph", "📊 Progress & History"], key="practice_tab", on_change="rerun")
 
     with tabs[0]:
-        if "last_submitted" not in st.session_state:
-            st.session_state.last_submitted = False
-
-        if st.session_state.last_submitted:
-            st.session_state.last_submitted = False
-            st.rerun()
-
-        with st.form(key="question_form"):
-            previous_concept = get_next_concept(st.session_state.learner_log, knowledge_graph)
-            question = choose_question(st.session_state.learner_log, knowledge_graph, question_bank)
-            current_concept = question["concept_tag"] if question else None
-            if current_concept and current_concept != previous_concept:
-                st.info(f"🎯 New Concept Unlocked: {current_concept}!")
-
-            if question:
-                st.subheader(question["text"])
-                user_answer = st.radio("Choose an answer:", question["options"], key=question["question_id"])
-            else:
-                user_answer = None
-
-            submit_clicked = st.form_submit_button("Submit")
-            if submit_clicked and question:
-                with st.spinner("Evaluating answer..."):
-                    time.sleep(1.5)
-                is_correct = (user_answer == question["correct_answer"])
-
-                concept = question["concept_tag"]
-                st.session_state.learner_log[concept]["attempts"] += 1
-
-                st.session_state.history.append({
-                    "question": question["text"],
-                    "answer": user_answer,
-                    "correct": is_correct
-                })
-
-                if is_correct:
-                    st.balloons()
-                    st.markdown("### 🎉 Great job! Keep it up!")
-                    next_level = next_bloom_level(question["bloom_level"])
-                    if next_level:
-                        st.session_state.learner_log[concept]["level"] = next_level
-                    else:
-                        st.session_state.learner_log[concept]["mastered"] = True
-                        st.session_state.learner_log[concept]["level"] = None
-                        st.success(f"🎉 You've mastered the concept: {concept}")
+        if tabs[0].open:
+            show_feedback()
+
+            with st.form(key="question_form"):
+                previous_concept = learner.next_concept()
+                with span("choose_question"):
+                    question = choose_question(learner, on_mastery=record_mastery)
+                current_concept = question["concept_tag"] if question else None
+                if current_concept and current_concept != previous_concept:
+                    st.info(f"🎯 New Concept Unlocked: {current_concept}!")
+
+                if question:
+                    st.subheader(question["text"])
+                    user_answer = st.radio("Choose an answer:", question["options"], key=question["question_id"])
                 else:
-                    st.snow()
-                    st.markdown("### 😓 Oops! Incorrect answer. Redirecting to prerequisite concept.")
-                    # Reset progress to the prerequisite concept
-                    prerequisites = knowledge_graph[concept]["prerequisite"]
-                    if prerequisites:
-                        # Redirect to the first unmet prerequisite
-                        for prereq in prerequisites:
-                            if not st.session_state.learner_log[prereq]["mastered"]:
-                                st.session_state.learner_log[prereq]["level"] = "Remembering"
-                                st.session_state.learner_log[concept]["level"] = None
-                                st.session_state.learner_log[concept]["mastered"] = False
-                                st.info(f"Redirecting to prerequisite concept: {prereq}")
-                                break
+                    user_answer = None
+
+                submit_clicked = st.form_submit_button("Submit")
+                if submit_clicked and question:
+                    is_correct = (user_answer == question["correct_answer"])
+
+                    concept = question["concept_tag"]
+                    before = learner.mark()
+                    learner.record_answer(question, user_answer, is_correct)
+                    outcome = apply_answer(learner, question, is_correct, on_mastery=record_mastery)
+                    db.insert({
+                        "event": "practice",
+                        "name": st.session_state.name,
+                        "question_id": question["question_id"],
+                        "concept": concept,
+                        "bloom_level": question["bloom_level"],
+                        "answer": user_answer,
+                        "correct": is_correct,
+                        "changes": learner.changes_since(before),
+                        "timestamp": datetime.now().isoformat()
+                    })
+                    if is_correct:
+                        feedback = start_feedback(True)
+                        feedback.append(("markdown", "### 🎉 Great job! Keep it up!"))
+                        if outcome.mastered:
+                            feedback.append(("success", f"🎉 You've mastered the concept: {concept}"))
                     else:
-                        st.warning("No prerequisites found for this concept. Please review the material.")
-
-                ph = st.empty()
-                for i in range(3, 0, -1):
-                    with ph.container():
-                        cols = st.columns([0.6, 0.3, 0.1])
-                        with cols[0]:
-                            st.markdown(f"#### ⏳ Next question in {i} seconds...")
-                            if is_correct:
-                                st.progress((3 - i + 1) / 3, text=f"Progress: {(3 - i + 1) * 33}% ✅")
-                            else:
-                                st.progress((3 - i + 1) / 3, text=f"Progress: {(3 - i + 1) * 33}% ❌")
-                        with cols[1]:
-                            st.markdown("<form action='' method='get'><button type='submit'>Next Now</button></form>", unsafe_allow_html=True)
-                    time.sleep(1)
-                    ph.empty()
-
-                st.session_state.last_submitted = True
-                st.rerun()
-
-            if question is None:
-                if any(log["attempts"] > 0 for log in st.session_state.learner_log.values()):
-                    st.success("🏁 You've mastered all concepts in this graph! Well done.")
-                    if st.form_submit_button("Practice next concept"):
-                        st.session_state.learner_log = defaultdict(lambda: {"level": "Remembering", "attempts": 0, "mastered": False})
-                        st.session_state.history = []
-                        st.rerun()
-                else:
-                    st.info("📘 Start practicing to see your progress here.")
+                        feedback = start_feedback(False)
+                        feedback.append(("markdown", "### 😓 Oops! Incorrect answer. Redirecting to prerequisite concept."))
+                        if outcome.redirected_to:
+                            feedback.append(("info", f"Redirecting to prerequisite concept: {outcome.redirected_to}"))
+                        elif not outcome.has_prerequisites:
+                            feedback.append(("warning", "No prerequisites found for this concept. Please review the material."))
+
+                    st.rerun()
+
+                if question is None:
+                    if learner.started():
+                        st.success("🏁 You've mastered all concepts in this graph! Well done.")
+                        if st.form_submit_button("Practice next concept"):
+                            st.session_state.learner = LearnerState(concept_graph, question_index)
+                            db.insert({"event": "practice_reset", "name": st.session_state.name, "timestamp": datetime.now().isoformat()})
+                            st.rerun()
+                    else:
+                        st.info("📘 Start practicing to see your progress here.")
 
     with tabs[1]:
-        st.subheader("📌 Concept Mastery Graph")
-        st.markdown("**Legend:** 🟩 Mastered | 🟥 Pending | 🟨 Current Concept")
-        filter_pending = st.checkbox("🔍 Show only pending concepts", value=False)
-        if filter_pending:
-            filtered_graph = {k: v for k, v in knowledge_graph.items() if not st.session_state.learner_log[k]["mastered"]}
-        else:
-            filtered_graph = knowledge_graph
-        plot_knowledge_graph(filtered_graph, st.session_state.learner_log, current_concept=get_next_concept(st.session_state.learner_log, knowledge_graph))
+        if tabs[1].open:
+            st.subheader("📌 Concept Mastery Graph")
+            st.markdown("**Legend:** 🟩 Mastered | 🟥 Pending | 🟨 Current Concept")
+            show_knowledge_graph(knowledge_graph, learner.is_mastered, current_concept=learner.next_concept())
     with tabs[2]:
-        st.subheader("📊 Your Learning Progress")
-
-        # Prepare data for the chart
-        concepts = list(st.session_state.learner_log.keys())
-        progress = [
-            1.0 if log["mastered"] else (0.5 if log["level"] else 0.0)
-            for log in st.session_state.learner_log.values()
-        ]  # 1.0 for mastered, 0.5 for in-progress, 0.0 for not started
-
-        # Create a bar chart
-        fig, ax = plt.subplots(figsize=(4, 2))
-        ax.barh(concepts, progress, color=["lightgreen" if p == 1.0 else "gold" if p == 0.5 else "lightcoral" for p in progress])
-        ax.set_xlim(0, 1)
-        ax.set_xlabel("Progress")
-        ax.set_title("Concept Mastery Progress")
-        ax.set_yticks(range(len(concepts)))
-        ax.set_yticklabels(concepts)
-
-        # Display the chart
-        st.pyplot(fig)
+        if tabs[2].open:
+            st.subheader("📊 Your Learning Progress")
 
-        st.markdown("---")
-        st.subheader("📜 Answer History")
-        for entry in st.session_state.history:
-            result = "✅" if entry["correct"] else "❌"
-            st.markdown(f"**Q:** {entry['question']}  ")
-            st.markdown(f"**Your Answer:** {entry['answer']} {result}")
+            # Prepare data for the chart
+            concepts = concept_graph.concepts
+            progress = [
+                1.0 if learner.is_mastered(c) else (0.5 if learner.level(c) else 0.0)
+                for c in concepts
+            ]  # 1.0 for mastered, 0.5 for in-progress, 0.0 for not started
+
+            with span("progress_chart"):
+                st.image(progress_chart_png(tuple(concepts), tuple(progress)), width="stretch")
+
+            st.markdown("---")
+            st.subheader("📜 Answer History")
+            show_answer_history(event_history(db, st.session_state.name, question_index), concepts)
 
 
 # Router
+resume_from_url()
+if st.session_state.logged_in and st.query_params.get("page") != st.session_state.page:
+    st.query_params["page"] = st.session_state.page
+
 if st.session_state.page == "login":
     show_login()
 elif st.session_state.page == "home":
@@ -633,8 +506,20 @@ elif st.session_state.page == "frame":
         show_frame()
 elif st.session_state.page == "practice":
     show_practice()
+elif st.session_state.page == "teacher":
+    show_teacher_dashboard(
+        db, load_data(), load_concept_graph(), load_question_index(),
+        [e for e in (get_content().last_error,) if e],
+    )
 else:
     st.error("Page not found.")
+
+# Reruns that logged enough events leave a fresh snapshot behind
+if st.session_state.logged_in:
+    save_session()
+
+# ?debug=1 lists where this rerun spent its time
+show_timings(st.query_params.get("debug") == "1")
 # Footer
 st.markdown(
     """
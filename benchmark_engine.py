@@ -0,0 +1,92 @@
+# Headless load benchmark for the adaptive practice engine
+#
+# Simulates synthetic learners through the real knowledge graph and question
+# bank data files (see practice_content.py), without Streamlit, and reports how many
+# question decisions per second one process sustains and how much memory each
+# learner's state takes.
+#
+#   python benchmark_engine.py --learners 100000 --bank question_bank_v2.json
+import argparse
+import random
+import time
+import tracemalloc
+
+from adaptive_engine import QuestionIndex, ConceptGraph, LearnerState, choose_question, apply_answer
+from practice_content import KNOWLEDGE_GRAPH_PATH, QUESTION_BANK_PATH, load_knowledge_graph, load_question_bank
+
+
+class SimulatedLearner:
+    __slots__ = ("state", "skill", "done")
+
+    def __init__(self, concept_graph, index, skill):
+        self.state = LearnerState(concept_graph, index)
+        self.skill = skill
+        self.done = False
+
+
+def step(learner, rng):
+    # One decision: pick the next question and apply a simulated answer
+    question = choose_question(learner.state)
+    if question is None:
+        # choose_question returns None once per concept it masters
+        learner.done = learner.state.next_concept() is None
+        return
+    correct = rng.random() < learner.skill
+    answer = question["correct_answer"]
+    if not correct:
+        answer = next(option for option in question["options"] if option != answer)
+    learner.state.record_answer(question, answer, correct)
+    apply_answer(learner.state, question, correct)
+
+
+def simulate(learners, rng, max_steps):
+    decisions = 0
+    for _ in range(max_steps):
+        active = [learner for learner in learners if not learner.done]
+        if not active:
+            break
+        for learner in active:
+            step(learner, rng)
+        decisions += len(active)
+    return decisions
+
+
+def run(graph_path, bank_path, n_learners, max_steps, seed, memory_sample):
+    concept_graph = ConceptGraph(load_knowledge_graph(graph_path))
+    index = QuestionIndex(load_question_bank(bank_path, concept_graph.graph))
+    rng = random.Random(seed)
+
+    learners = [SimulatedLearner(concept_graph, index, rng.uniform(0.4, 0.95)) for _ in range(n_learners)]
+    start = time.perf_counter()
+    decisions = simulate(learners, rng, max_steps)
+    elapsed = time.perf_counter() - start
+    finished = sum(learner.done for learner in learners)
+    del learners
+
+    # Memory is sampled separately; tracemalloc would distort the timing above
+    sample = min(memory_sample, n_learners)
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    learners = [SimulatedLearner(concept_graph, index, rng.uniform(0.4, 0.95)) for _ in range(sample)]
+    simulate(learners, rng, max_steps)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_learner = (used - base) / sample
+
+    print(f"content:           {graph_path}, {bank_path} ({len(concept_graph)} concepts, {len(index)} questions)")
+    print(f"learners:          {n_learners} ({finished} finished the graph)")
+    print(f"decisions:         {decisions} in {elapsed:.2f}s -> {decisions / elapsed:,.0f}/s")
+    print(f"memory / learner:  {per_learner / 1024:.2f} KiB after finishing "
+          f"(~{per_learner * n_learners / 2**20:.0f} MiB for all learners)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--graph", default=KNOWLEDGE_GRAPH_PATH, help="knowledge graph data file")
+    parser.add_argument("--bank", default=QUESTION_BANK_PATH, help="question bank data file")
+    parser.add_argument("--learners", type=int, default=10000)
+    parser.add_argument("--max-steps", type=int, default=200, help="decisions per learner before giving up")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory-sample", type=int, default=1000, help="learners traced for the memory figure")
+    args = parser.parse_args()
+    run(args.graph, args.bank, args.learners, args.max_steps, args.seed, args.memory_sample)
@@ -0,0 +1,240 @@
+# Cohort simulator for the branching content and the redirection map
+#
+# Frames (branching_content.xlsx) and practice questions
+# (adaptive_redirection_map_v2.json) are compiled into integer-indexed
+# transition tables: for every state, the next state and probability of each
+# outcome.  A whole cohort is then advanced one step at a time with NumPy, so
+# millions of simulated learners take seconds.
+#
+#   python cohort_simulator.py --learners 1000000 --p-correct 0.7 --p main_frame_2=0.4
+#   python cohort_simulator.py --questions --p Q2.1=0.3
+import argparse
+from typing import NamedTuple
+
+import numpy as np
+
+from content_bundle import COMPLETE, CONTENT_PATH, START_FRAME, load_frames
+from practice_content import ADAPTIVE_QUESTION_BANK_PATH, load_question_bank
+from redirection_map import REDIRECTION_MAP_PATH, SERVE, load_redirection_map
+
+DEAD_END = "dead end"
+
+
+class TransitionModel(NamedTuple):
+    states: list            # state names; terminal states come last
+    next_state: np.ndarray  # (states, outcomes) int, -1 where an outcome does not exist
+    probs: np.ndarray       # (states, outcomes) float, rows of non-terminal states sum to 1
+    start: int
+    n_terminal: int
+    remedial: np.ndarray    # (states,) bool, states counted as remedial loops
+
+    @property
+    def n_transient(self):
+        return len(self.states) - self.n_terminal
+
+
+def _build(states, outcomes, start, terminals, remedial=()):
+    # outcomes: {state: [(next_state_name, probability), ...]}
+    names = list(states) + list(terminals)
+    position = {name: i for i, name in enumerate(names)}
+    width = max((len(o) for o in outcomes.values()), default=1)
+    next_state = np.full((len(names), width), -1, dtype=np.int32)
+    probs = np.zeros((len(names), width))
+    for state, edges in outcomes.items():
+        for k, (target, p) in enumerate(edges):
+            next_state[position[state], k] = position[target]
+            probs[position[state], k] = p
+    is_remedial = np.array([name in remedial for name in names])
+    return TransitionModel(names, next_state, probs, position[start], len(terminals), is_remedial)
+
+
+def _split(p_correct, results):
+    # The correct options share p_correct, the incorrect ones the rest
+    n_correct = sum(results)
+    n_incorrect = len(results) - n_correct
+    if not n_incorrect:
+        return [1.0 / n_correct] * n_correct
+    if not n_correct:
+        return [1.0 / n_incorrect] * n_incorrect
+    return [p_correct / n_correct if ok else (1 - p_correct) / n_incorrect for ok in results]
+
+
+# -------------------- Frames -------------------- #
+def frame_model(frames, p_correct=0.7, overrides=None, start=START_FRAME):
+    # A remedial frame returns to the main frame that sent the learner there,
+    # so each (remedial frame, main frame) pair is its own state.
+    overrides = overrides or {}
+    main = [f for f, opts in frames["options"].items() if opts]
+    states = list(main)
+    outcomes = {}
+    remedial = set()
+    dead_end = False
+    for frame in main:
+        opts = frames.at[frame, "options"]
+        probs = _split(overrides.get(frame, p_correct), [opt.is_correct for opt in opts])
+        edges = []
+        for opt, p in zip(opts, probs):
+            if opt.next_step == COMPLETE:
+                target = COMPLETE
+            elif opt.next_step not in frames.index:
+                target, dead_end = DEAD_END, True
+            elif frames.at[opt.next_step, "options"]:
+                target = opt.next_step
+            else:
+                target = f"{opt.next_step}@{frame}"
+                if target not in remedial:
+                    remedial.add(target)
+                    states.append(target)
+                    outcomes[target] = [(frame, 1.0)]
+            edges.append((target, p))
+        outcomes[frame] = edges
+    terminals = [COMPLETE] + ([DEAD_END] if dead_end else [])
+    return _build(states, outcomes, start, terminals, remedial)
+
+
+# -------------------- Questions -------------------- #
+def question_model(question_index, redirects, p_correct=0.7, overrides=None, start=None):
+    # Questions without a map entry, or an outcome the map leaves out, are dead ends
+    overrides = overrides or {}
+    ids = [q["question_id"] for q in question_index.questions]
+    start = start or ids[0]
+    outcomes = {}
+    terminals = []
+    for qid in ids:
+        redirect = redirects.get(qid)
+        edges = []
+        if redirect is not None:
+            p = overrides.get(qid, p_correct)
+            for action, prob in ((redirect.if_correct, p), (redirect.if_incorrect, 1 - p)):
+                if action is None:
+                    target = DEAD_END
+                elif action.kind == SERVE:
+                    target = action.question_id
+                else:
+                    target = action.kind
+                if target not in ids and target not in terminals:
+                    terminals.append(target)
+                edges.append((target, prob))
+        else:
+            edges.append((DEAD_END, 1.0))
+            if DEAD_END not in terminals:
+                terminals.append(DEAD_END)
+        outcomes[qid] = edges
+    return _build(ids, outcomes, start, terminals)
+
+
+# -------------------- Simulation -------------------- #
+class CohortResult(NamedTuple):
+    path_length: np.ndarray      # (learners,) steps taken
+    remedial_visits: np.ndarray  # (learners,) visits to remedial states
+    final_state: np.ndarray      # (learners,) state each learner stopped in
+    visits: np.ndarray           # (states,) total visits per state
+    revisits: np.ndarray         # (states,) learners that entered the state more than once
+
+
+def simulate(model, n_learners, max_steps=100, seed=0):
+    rng = np.random.default_rng(seed)
+    cumulative = np.cumsum(model.probs, axis=1)
+    # The last real outcome of each row catches rounding, never the -1 padding
+    last = (model.next_state >= 0).sum(axis=1) - 1
+    rows = np.flatnonzero(last >= 0)
+    cumulative[rows, last[rows]] = np.inf
+    n_states = len(model.states)
+    state = np.full(n_learners, model.start, dtype=np.int32)
+    path_length = np.zeros(n_learners, dtype=np.int32)
+    remedial_visits = np.zeros(n_learners, dtype=np.int32)
+    # Visit counts per (learner, state) would not fit for millions of learners;
+    # track only whether each learner has already been in each state
+    seen = np.zeros((n_learners, n_states), dtype=bool)
+    seen[np.arange(n_learners), state] = True
+    revisits = np.zeros(n_states, dtype=np.int64)
+    revisited = np.zeros((n_learners, n_states), dtype=bool)
+    visits = np.bincount(state, minlength=n_states).astype(np.int64)
+
+    active = np.flatnonzero(state < model.n_transient)
+    for _ in range(max_steps):
+        if not active.size:
+            break
+        current = state[active]
+        u = rng.random(active.size)
+        choice = (u[:, None] >= cumulative[current]).sum(axis=1)
+        nxt = model.next_state[current, choice]
+        state[active] = nxt
+        path_length[active] += 1
+        remedial_visits[active] += model.remedial[nxt]
+        visits += np.bincount(nxt, minlength=n_states)
+        again = seen[active, nxt]
+        first_again = again & ~revisited[active, nxt]
+        revisited[active[first_again], nxt[first_again]] = True
+        revisits += np.bincount(nxt[first_again], minlength=n_states)
+        seen[active, nxt] = True
+        active = active[nxt < model.n_transient]
+    return CohortResult(path_length, remedial_visits, state, visits, revisits)
+
+
+def expected_path_length(model):
+    # Absorbing-chain expectation from the start state: (I - Q)^-1 · 1
+    n = model.n_transient
+    Q = np.zeros((n, n))
+    for k in range(model.next_state.shape[1]):
+        targets = model.next_state[:n, k]
+        inside = (targets >= 0) & (targets < n)
+        np.add.at(Q, (np.flatnonzero(inside), targets[inside]), model.probs[:n, k][inside])
+    try:
+        steps = np.linalg.solve(np.eye(n) - Q, np.ones(n))
+    except np.linalg.LinAlgError:
+        return float("inf")  # some states can never reach a terminal state
+    return float(steps[model.start])
+
+
+def report(model, result, max_steps):
+    n = len(result.path_length)
+    finished = result.final_state >= model.n_transient
+    print(f"learners:              {n:,}")
+    print(f"expected path length:  {expected_path_length(model):.2f} steps (exact)")
+    print(f"mean path length:      {result.path_length[finished].mean() if finished.any() else float('nan'):.2f} steps "
+          f"(p50 {np.median(result.path_length):.0f}, p95 {np.percentile(result.path_length, 95):.0f})")
+    if model.remedial.any():
+        print(f"remedial loop rate:    {(result.remedial_visits > 0).mean():.1%} of learners, "
+              f"{result.remedial_visits.mean():.2f} remedial visits each")
+    print(f"still going after {max_steps} steps: {(~finished).mean():.2%}")
+    print("outcomes:")
+    for i in range(model.n_transient, len(model.states)):
+        print(f"  {model.states[i]:<22} {(result.final_state == i).mean():.1%}")
+    print("states (visits per learner, learners looping back):")
+    for i in range(model.n_transient):
+        print(f"  {model.states[i]:<30} {result.visits[i] / n:6.2f}  {result.revisits[i] / n:6.1%}")
+
+
+def _overrides(pairs):
+    overrides = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        overrides[key] = float(value)
+    return overrides
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", action="store_true", help="simulate the redirection map instead of the frames")
+    parser.add_argument("--learners", type=int, default=1_000_000)
+    parser.add_argument("--p-correct", type=float, default=0.7, help="default chance of a correct answer")
+    parser.add_argument("--p", action="append", default=[], metavar="ID=P", help="per frame/question override")
+    parser.add_argument("--start", help="first frame/question (default: main_frame_1 / first question in the bank)")
+    parser.add_argument("--max-steps", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--content", default=CONTENT_PATH)
+    parser.add_argument("--map", default=REDIRECTION_MAP_PATH)
+    parser.add_argument("--bank", default=ADAPTIVE_QUESTION_BANK_PATH,
+                        help="question bank the redirection map refers to")
+    args = parser.parse_args()
+
+    if args.questions:
+        from adaptive_engine import QuestionIndex
+        index = QuestionIndex(load_question_bank(args.bank))
+        redirects = load_redirection_map(index, args.map)
+        model = question_model(index, redirects, args.p_correct, _overrides(args.p), start=args.start)
+    else:
+        model = frame_model(load_frames(args.content), args.p_correct, _overrides(args.p), start=args.start or START_FRAME)
+    result = simulate(model, args.learners, args.max_steps, args.seed)
+    report(model, result, args.max_steps)
@@ -0,0 +1,238 @@
+# Compiled content bundle for branching_content.xlsx
+#
+# The workbook is parsed with openpyxl once per content version and written to
+# a compact columnar bundle keyed by the sha256 of the xlsx bytes.  Later cold
+# starts read that bundle instead of re-parsing the workbook.  The bundle is
+# plain JSON: it may sit in a directory shared with other processes
+# (BPI_CONTENT_CACHE), so reading it must never run code.
+#
+#   python content_bundle.py [branching_content.xlsx]   # build step
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import NamedTuple
+
+import pandas as pd
+
+CONTENT_PATH = "branching_content.xlsx"
+BUNDLE_DIR = ".content_cache"
+# Shared cache directory for multi-worker deployments (see serve_workers.py)
+BUNDLE_CACHE = os.environ.get("BPI_CONTENT_CACHE")
+SHEETS = ("Main_frame", "Remedial_frame")
+START_FRAME = "main_frame_1"
+COMPLETE = "complete"
+OPTION_COLUMNS = ("option_a", "option_b", "option_c")
+
+BUNDLE_SUFFIX = ".bundle.json"
+BUNDLE_VERSION = 3
+
+
+class ContentError(ValueError):
+    pass
+
+
+# -------------------- Options -------------------- #
+class FrameOption(NamedTuple):
+    ans: str
+    result: str
+    next_step: str
+    feedback: str
+
+    @property
+    def is_correct(self):
+        return self.result.lower() == "correct"
+
+
+OPTION_RESULTS = ("correct", "incorrect")
+_OPTION_PATTERNS = {
+    key: re.compile(rf'{key}\s*[:=]\s*(.*?)(,|$)', re.IGNORECASE | re.DOTALL)
+    for key in FrameOption._fields
+}
+
+
+def parse_option(raw):
+    # Only called while compiling the bundle; reruns read the parsed FrameOption
+    if not isinstance(raw, str):
+        raise ContentError(f"expected option text, got {raw!r}")
+    fields = {}
+    for key, pattern in _OPTION_PATTERNS.items():
+        match = pattern.search(raw)
+        value = match.group(1).strip(" \"{}") if match else ""
+        if not value:
+            raise ContentError(f"missing '{key}' in option {raw!r}")
+        fields[key] = value
+    if fields["result"].lower() not in OPTION_RESULTS:
+        raise ContentError(f"result must be one of {OPTION_RESULTS}, got {fields['result']!r}")
+    return FrameOption(**fields)
+
+
+def content_hash(path=CONTENT_PATH):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def bundle_path(path=CONTENT_PATH, digest=None, bundle_dir=None):
+    digest = digest or content_hash(path)
+    bundle_dir = bundle_dir or BUNDLE_CACHE or os.path.join(os.path.dirname(os.path.abspath(path)), BUNDLE_DIR)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(bundle_dir, f"{stem}-{digest[:16]}{BUNDLE_SUFFIX}")
+
+
+# -------------------- Build -------------------- #
+def _cell(value):
+    # NaN from empty cells is stored as None, numpy scalars as Python ones and
+    # anything else JSON cannot hold (dates) as text
+    if pd.isna(value):
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    return value if isinstance(value, (str, int, float, bool)) else str(value)
+
+
+def compile_bundle(path=CONTENT_PATH, digest=None):
+    frames = []
+    for sheet in SHEETS:
+        df = pd.read_excel(path, sheet_name=sheet)
+        df["source"] = sheet
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+
+    index = [str(name) for name in df["frame_name"]]
+    columns = {
+        col: [_cell(v) for v in df[col]]
+        for col in df.columns if col != "frame_name"
+    }
+
+    options = {}
+    edges = {}
+    for i, frame in enumerate(index):
+        if columns["source"][i] != "Main_frame":
+            continue
+        parsed = []
+        for col in OPTION_COLUMNS:
+            try:
+                parsed.append(parse_option(columns.get(col, [None] * len(index))[i]))
+            except ContentError as e:
+                raise ContentError(f"{path}: {frame}.{col}: {e}") from None
+        # Stored as plain tuples so the bundle does not depend on this module
+        options[frame] = [tuple(opt) for opt in parsed]
+        edges[frame] = [opt.next_step for opt in parsed]
+
+    return {
+        "version": BUNDLE_VERSION,
+        "hash": digest or content_hash(path),
+        "index": index,
+        "columns": columns,
+        "options": options,
+        "edges": edges,
+    }
+
+
+def write_bundle(bundle, out_path):
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(bundle, f, ensure_ascii=False, separators=(",", ":"))
+    # Atomic so concurrent workers never read a half-written bundle
+    os.replace(tmp_path, out_path)
+
+    # Drop bundles compiled from older versions of the same workbook (and
+    # pickled bundles from before BUNDLE_VERSION 3)
+    stem = os.path.basename(out_path).rsplit("-", 1)[0]
+    for name in os.listdir(os.path.dirname(out_path)):
+        old = os.path.join(os.path.dirname(out_path), name)
+        if name.startswith(stem + "-") and name.endswith((BUNDLE_SUFFIX, ".bundle")) and old != out_path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def read_bundle(in_path):
+    with open(in_path, encoding="utf-8") as f:
+        bundle = json.load(f)
+    if not isinstance(bundle, dict):
+        raise ValueError(f"{in_path} is not a content bundle")
+    return bundle
+
+
+# -------------------- Load -------------------- #
+def load_bundle(path=CONTENT_PATH):
+    digest = content_hash(path)
+    out_path = bundle_path(path, digest)
+    if os.path.exists(out_path):
+        try:
+            bundle = read_bundle(out_path)
+            if bundle.get("version") == BUNDLE_VERSION and bundle.get("hash") == digest:
+                return bundle
+        except (OSError, ValueError):
+            pass
+    bundle = compile_bundle(path, digest)
+    write_bundle(bundle, out_path)
+    return bundle
+
+
+def bundle_to_frame(bundle):
+    df = pd.DataFrame(bundle["columns"], index=pd.Index(bundle["index"], name="frame_name"))
+    options = bundle["options"]
+    df["options"] = pd.Series(
+        [
+            tuple(FrameOption(*opt) for opt in options[frame]) if frame in options else None
+            for frame in bundle["index"]
+        ],
+        index=df.index,
+        dtype=object,
+    )
+    return df
+
+
+def load_frames(path=CONTENT_PATH):
+    return bundle_to_frame(load_bundle(path))
+
+
+# -------------------- Validate -------------------- #
+def frame_problems(df, start=START_FRAME):
+    # Every branch a learner can take has to land on a frame that exists:
+    # a correct answer leads to a main frame (or completes the path), a wrong
+    # one to a remedial frame, whose "Return to Main Frame" button goes back
+    # to main_frame_<n> of the frame that sent the learner there.
+    problems = []
+    for frame in df.index[df.index.duplicated()].unique():
+        problems.append(f"frame '{frame}' is defined more than once")
+    if start not in df.index:
+        problems.append(f"start frame '{start}' is missing")
+    main = set(df.index[df["source"] == "Main_frame"])
+    for frame, options in df.loc[df["source"] == "Main_frame", "options"].items():
+        for opt in options:
+            if opt.is_correct:
+                if opt.next_step != COMPLETE and opt.next_step not in main:
+                    problems.append(f"{frame}: correct answer {opt.ans!r} leads to '{opt.next_step}', which is not a main frame")
+            elif opt.next_step not in df.index or opt.next_step in main:
+                problems.append(f"{frame}: answer {opt.ans!r} leads to '{opt.next_step}', which is not a remedial frame")
+            elif "main_frame_" + frame.split("_")[-1] not in main:
+                problems.append(f"{frame}: remedial frame '{opt.next_step}' cannot return to 'main_frame_{frame.split('_')[-1]}'")
+    return problems
+
+
+def validate_frames(df, start=START_FRAME):
+    problems = frame_problems(df, start)
+    if problems:
+        raise ContentError("; ".join(problems))
+    return df
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else CONTENT_PATH
+    digest = content_hash(src)
+    out = bundle_path(src, digest)
+    bundle = compile_bundle(src, digest)
+    problems = frame_problems(bundle_to_frame(bundle))
+    if problems:
+        sys.exit(f"{src}:\n  " + "\n  ".join(problems))
+    write_bundle(bundle, out)
+    print(f"Compiled {src} -> {out}")
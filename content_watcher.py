@@ -0,0 +1,68 @@
+# Hot-reloaded content
+#
+# A ContentWatcher holds one built, validated piece of content (the frame
+# table, the redirection map) and a daemon thread that polls the source
+# files' mtimes every RELOAD_INTERVAL seconds.  When they change the content
+# is rebuilt and validated on that thread, then swapped in with a single
+# reference assignment: a rerun reads either the old or the new content,
+# never a mix, and never waits for a rebuild.  A build that fails keeps the
+# previous content in use and is reported in last_error.  The content is only
+# required to be valid at startup.
+import os
+import threading
+import time
+
+from instrumentation import span
+
+RELOAD_INTERVAL = 2.0
+
+
+class ContentWatcher:
+    def __init__(self, paths, build, interval=RELOAD_INTERVAL, name="content-watcher"):
+        self.paths = tuple(paths)
+        self.build = build
+        self.name = name
+        self.interval = interval
+        self.last_error = None
+        self.version = 1
+        self.loaded_at = time.time()
+        self._mtimes = self._stat()
+        with span(f"{self.name}.build"):
+            self.current = build()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name=name, daemon=True)
+        self._thread.start()
+
+    def _stat(self):
+        return tuple(os.stat(path).st_mtime_ns for path in self.paths)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self):
+        # Returns True when new content was swapped in
+        try:
+            mtimes = self._stat()
+        except OSError as e:
+            self.last_error = e
+            return False
+        if mtimes == self._mtimes:
+            return False
+        self._mtimes = mtimes
+        try:
+            with span(f"{self.name}.build"):
+                content = self.build()
+        except Exception as e:
+            # Half-saved workbooks fail in openpyxl/zipfile, not just ValueError
+            self.last_error = e
+            return False
+        self.current = content
+        self.version += 1
+        self.loaded_at = time.time()
+        self.last_error = None
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,247 @@
+# Columnar analytics export of learner events
+#
+# Copies new events from the event store into Parquet files partitioned by
+# day (<out>/day=YYYY-MM-DD/part-<first id>-<last id>.parquet).  Runs are
+# incremental: the highest exported event id is read back from the part file
+# names, so the job can be re-run from cron at any time.  compact() merges
+# the parts of a day into one file.  The query helpers below scan the
+# dataset with pyarrow instead of iterating event dicts.
+# Files being written carry a leading underscore, which dataset readers skip,
+# until they are complete.  A merged day file is kept under _compacting-<part>
+# until the parts it replaces are gone; a compaction cut short is finished
+# by the next export or compact run, so no row is ever read twice.
+#
+#   python event_export.py export            # new events -> analytics/
+#   python event_export.py compact           # one file per day
+#   python event_export.py report --since 2025-01-01
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from event_store import EVENT_DB_PATH, EventStore
+
+EXPORT_DIR = os.environ.get("BPI_ANALYTICS_DIR", "analytics")
+EXPORT_BATCH = 100_000
+# Gaps longer than this are breaks, not time spent on a frame
+TIME_ON_FRAME_CAP = 30 * 60
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("event", pa.string()),
+    ("name", pa.string()),
+    ("frame", pa.string()),
+    ("result", pa.string()),
+    ("selected_answer", pa.string()),
+    ("question_id", pa.string()),
+    ("concept", pa.string()),
+    ("answer", pa.string()),
+    ("correct", pa.bool_()),
+    ("mastered", pa.bool_()),
+    ("age", pa.int32()),
+    ("gender", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+])
+PARTITIONING = ds.partitioning(pa.schema([("day", pa.string())]), flavor="hive")
+_PART = re.compile(r"part-(\d+)-(\d+)\.parquet$")
+_COMPACTING = "_compacting-"
+
+
+# -------------------- Export -------------------- #
+def exported_up_to(out_dir=EXPORT_DIR):
+    last = 0
+    for _, _, files in os.walk(out_dir):
+        for name in files:
+            match = _PART.match(name)
+            if match:
+                last = max(last, int(match.group(2)))
+    return last
+
+
+def _to_table(rows):
+    columns = {field.name: [] for field in SCHEMA if field.name not in ("id", "timestamp")}
+    for _, doc in rows:
+        for key, values in columns.items():
+            values.append(doc.get(key))
+    timestamps = pd.to_datetime([doc.get("timestamp") for _, doc in rows], errors="coerce", format="ISO8601")
+    arrays = {"id": [event_id for event_id, _ in rows], **columns, "timestamp": timestamps}
+    return pa.table(arrays, schema=SCHEMA)
+
+
+def _write_part(table, out_dir, day, prefix=""):
+    part_dir = os.path.join(out_dir, f"day={day}")
+    os.makedirs(part_dir, exist_ok=True)
+    ids = table["id"]
+    name = f"{prefix}part-{pc.min(ids).as_py():012d}-{pc.max(ids).as_py():012d}.parquet"
+    path = os.path.join(part_dir, name)
+    tmp_path = os.path.join(part_dir, f"_{name}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path)
+    # Atomic so a reader never scans a half-written part
+    os.replace(tmp_path, path)
+    return path
+
+
+def _finish_compaction(part_dir):
+    # Removes the parts a complete _compacting- file covers, then moves it in
+    # place.  Parts exported after the compaction started have higher ids and
+    # are kept.  Safe to run again, or alongside another run, at any point.
+    for name in os.listdir(part_dir):
+        match = _PART.match(name[len(_COMPACTING):]) if name.startswith(_COMPACTING) else None
+        if match is None:
+            continue
+        first, last = int(match.group(1)), int(match.group(2))
+        for part in os.listdir(part_dir):
+            covered = _PART.match(part)
+            if covered and first <= int(covered.group(1)) and int(covered.group(2)) <= last:
+                try:
+                    os.remove(os.path.join(part_dir, part))
+                except FileNotFoundError:
+                    pass
+        try:
+            os.replace(os.path.join(part_dir, name), os.path.join(part_dir, name[len(_COMPACTING):]))
+        except FileNotFoundError:
+            pass
+
+
+def _day_dirs(out_dir):
+    if not os.path.isdir(out_dir):
+        return []
+    return [entry for entry in sorted(os.listdir(out_dir)) if entry.startswith("day=")]
+
+
+def export(store, out_dir=EXPORT_DIR, batch=EXPORT_BATCH):
+    # Returns the number of events written
+    store.flush()
+    for entry in _day_dirs(out_dir):
+        _finish_compaction(os.path.join(out_dir, entry))
+    after = exported_up_to(out_dir)
+    written = 0
+    while True:
+        rows = store.events_since(after, batch)
+        if not rows:
+            return written
+        table = _to_table(rows)
+        days = pc.strftime(table["timestamp"], format="%Y-%m-%d").fill_null("unknown")
+        for day in pc.unique(days).to_pylist():
+            _write_part(table.filter(pc.equal(days, day)), out_dir, day)
+        written += len(rows)
+        after = rows[-1][0]
+
+
+def compact(out_dir=EXPORT_DIR, day=None):
+    # Merges each day's parts into a single file; returns the days rewritten
+    rewritten = []
+    for entry in _day_dirs(out_dir):
+        if day and entry != f"day={day}":
+            continue
+        part_dir = os.path.join(out_dir, entry)
+        _finish_compaction(part_dir)
+        parts = sorted(name for name in os.listdir(part_dir) if _PART.match(name))
+        if len(parts) < 2:
+            continue
+        table = pa.concat_tables(pq.read_table(os.path.join(part_dir, name), schema=SCHEMA) for name in parts)
+        # Written beside the parts first; a crash from here on leaves it for the next run to finish
+        _write_part(table.sort_by("id"), out_dir, entry[len("day="):], prefix=_COMPACTING)
+        _finish_compaction(part_dir)
+        rewritten.append(entry[len("day="):])
+    return rewritten
+
+
+# -------------------- Query -------------------- #
+def load_events(out_dir=EXPORT_DIR, event=None, since=None, until=None, columns=None):
+    # since/until are inclusive YYYY-MM-DD days; only matching partitions are read
+    dataset = ds.dataset(out_dir, format="parquet", partitioning=PARTITIONING, schema=SCHEMA.append(pa.field("day", pa.string())))
+    condition = None
+    for part in (
+        ds.field("event") == event if event else None,
+        ds.field("day") >= since if since else None,
+        ds.field("day") <= until if until else None,
+    ):
+        if part is not None:
+            condition = part if condition is None else condition & part
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+def _responses(table):
+    return table.filter(pc.equal(table["event"], "response"))
+
+
+def success_rate_by_frame(table):
+    responses = _responses(table)
+    correct = pc.equal(pc.utf8_lower(responses["result"]), "correct").cast(pa.int64())
+    stats = pa.table({"frame": responses["frame"], "correct": correct, "name": responses["name"]}).group_by("frame").aggregate([
+        ("correct", "count"), ("correct", "sum"), ("name", "count_distinct"),
+    ])
+    df = stats.rename_columns(["frame", "responses", "correct", "learners"]).to_pandas()
+    df["success_rate"] = df["correct"] / df["responses"]
+    return df.sort_values("frame", ignore_index=True)
+
+
+def remedial_detours(table):
+    # Every incorrect response sends the learner through a remedial frame
+    responses = _responses(table)
+    detours = responses.filter(pc.not_equal(pc.utf8_lower(responses["result"]), "correct"))
+    stats = detours.group_by(["frame", "selected_answer"]).aggregate([("id", "count"), ("name", "count_distinct")])
+    df = stats.rename_columns(["frame", "selected_answer", "detours", "learners"]).to_pandas()
+    return df.sort_values(["frame", "detours"], ascending=[True, False], ignore_index=True)
+
+
+def time_on_frame(table, cap=TIME_ON_FRAME_CAP):
+    # Seconds from a learner's previous event (login, earlier answer) to each response
+    ordered = table.select(["id", "event", "name", "frame", "timestamp"]).sort_by([("name", "ascending"), ("id", "ascending")])
+    names = ordered["name"].to_numpy(zero_copy_only=False)
+    seconds = ordered["timestamp"].cast(pa.int64()).to_numpy(zero_copy_only=False) / 1e6
+    elapsed = np.full(len(ordered), np.nan)
+    if len(ordered) > 1:
+        same_learner = names[1:] == names[:-1]
+        elapsed[1:] = np.where(same_learner, seconds[1:] - seconds[:-1], np.nan)
+    keep = (ordered["event"].to_numpy(zero_copy_only=False) == "response") & (elapsed >= 0) & (elapsed <= cap)
+    spans = pa.table({"frame": ordered["frame"].filter(pa.array(keep)), "seconds": elapsed[keep]})
+    stats = spans.group_by("frame").aggregate([
+        ("seconds", "count"), ("seconds", "mean"), ("seconds", "approximate_median"),
+    ])
+    df = stats.rename_columns(["frame", "responses", "mean_seconds", "median_seconds"]).to_pandas()
+    return df.sort_values("frame", ignore_index=True)
+
+
+def question_error_rates(table):
+    practice = table.filter(pc.equal(table["event"], "practice"))
+    wrong = pc.invert(practice["correct"].fill_null(False)).cast(pa.int64())
+    stats = pa.table({"question_id": practice["question_id"], "wrong": wrong}).group_by("question_id").aggregate([
+        ("wrong", "count"), ("wrong", "sum"),
+    ])
+    df = stats.rename_columns(["question_id", "answers", "incorrect"]).to_pandas()
+    df["error_rate"] = df["incorrect"] / df["answers"]
+    return df.sort_values("error_rate", ascending=False, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=("export", "compact", "report"))
+    parser.add_argument("--db", default=EVENT_DB_PATH)
+    parser.add_argument("--out", default=EXPORT_DIR)
+    parser.add_argument("--day", help="compact only this day")
+    parser.add_argument("--since", help="report: first day (YYYY-MM-DD)")
+    parser.add_argument("--until", help="report: last day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"exported {export(EventStore(args.db), args.out)} events to {args.out}")
+    elif args.command == "compact":
+        print(f"compacted: {', '.join(compact(args.out, args.day)) or 'nothing to do'}")
+    else:
+        events = load_events(args.out, since=args.since, until=args.until)
+        print(f"{events.num_rows} events")
+        for title, report in (
+            ("Success rate by frame", success_rate_by_frame),
+            ("Remedial detours", remedial_detours),
+            ("Time on frame", time_on_frame),
+            ("Question error rates", question_error_rates),
+        ):
+            print(f"\n{title}\n{report(events).to_string(index=False)}")
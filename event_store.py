@@ -0,0 +1,502 @@
+# Durable learner event store
+#
+# Login/response events are written to a local SQLite database in WAL mode so
+# they survive page refreshes and are shared by every session and worker
+# process on the host.  Queries go through the (name, event) and
+# (name, frame) indexes instead of scanning every stored document.
+# Class-wide aggregates for the teacher dashboard (frame funnel, remedial
+# hits, concept mastery, question p-values) are maintained the same way, so
+# the dashboard reads a few rows per frame/concept/question whatever the
+# class size.
+# learner_snapshots holds the latest compact session snapshot per learner;
+# the events logged after it are the tail replayed on resume (see
+# learner_sessions.py).
+#
+# insert() only queues the event: a background writer thread commits
+# everything queued by every session in one transaction, so a click never
+# waits on storage.  Reads about a learner first wait for that learner's
+# queued events (read-your-writes); flush() waits explicitly.
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import warnings
+from collections import Counter
+from typing import NamedTuple
+
+from instrumentation import timed
+
+EVENT_DB_PATH = os.environ.get("BPI_EVENT_DB", "bpi_events.sqlite3")
+# A group commit closes after WRITE_BATCH_SIZE events or WRITE_BATCH_WINDOW seconds
+WRITE_BATCH_SIZE = 500
+WRITE_BATCH_WINDOW = 0.01
+# A batch still locked out after busy_timeout is retried this many times, then dropped
+WRITE_RETRIES = 3
+# Longest a read waits on the writer before reading what is committed
+FLUSH_TIMEOUT = 60
+# Bump when the aggregate tables change; older stores are rebuilt from the log
+AGGREGATES_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    event     TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    frame     TEXT,
+    result    TEXT,
+    timestamp TEXT NOT NULL,
+    data      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_name_event ON events (name, event);
+CREATE INDEX IF NOT EXISTS events_name_frame ON events (name, frame);
+CREATE INDEX IF NOT EXISTS events_name_id ON events (name, id);
+
+CREATE TABLE IF NOT EXISTS learner_progress (
+    name              TEXT PRIMARY KEY,
+    responses         INTEGER NOT NULL DEFAULT 0,
+    completed_frames  INTEGER NOT NULL DEFAULT 0,
+    practice_answers  INTEGER NOT NULL DEFAULT 0,
+    mastered_concepts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS learner_completed (
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key  TEXT NOT NULL,
+    PRIMARY KEY (name, kind, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS class_totals (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS frame_stats (
+    frame     TEXT PRIMARY KEY,
+    responses INTEGER NOT NULL DEFAULT 0,
+    correct   INTEGER NOT NULL DEFAULT 0,
+    reached   INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS remedial_hits (
+    frame  TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    hits   INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (frame, answer)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS concept_stats (
+    concept  TEXT PRIMARY KEY,
+    mastered INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mastery_histogram (
+    mastered_concepts INTEGER PRIMARY KEY,
+    learners          INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS question_stats (
+    question_id TEXT PRIMARY KEY,
+    answers     INTEGER NOT NULL DEFAULT 0,
+    correct     INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS learner_snapshots (
+    name          TEXT PRIMARY KEY,
+    event_id      INTEGER NOT NULL,
+    current_frame TEXT,
+    frames        BLOB,
+    practice      BLOB,
+    timestamp     TEXT NOT NULL
+);
+"""
+AGGREGATE_TABLES = (
+    "learner_progress", "learner_completed", "class_totals", "frame_stats",
+    "remedial_hits", "concept_stats", "mastery_histogram", "question_stats",
+)
+
+
+# Per-learner aggregate read by the home page
+class LearnerProgress(NamedTuple):
+    responses: int = 0
+    completed_frames: int = 0
+    practice_answers: int = 0
+    mastered_concepts: int = 0
+
+
+# Whole-class aggregates read by the teacher dashboard
+class ClassStats(NamedTuple):
+    learners: int
+    frames: dict             # frame -> (responses, correct, learners reached, learners completed)
+    remedial_hits: list      # (frame, wrong answer, hits), most hit first
+    concepts: dict           # concept -> learners who have mastered it
+    mastery_histogram: dict  # mastered concept count -> learners
+    questions: dict          # question_id -> (answers, correct)
+
+
+# One page of a learner's practice answers, newest first
+class HistoryPage(NamedTuple):
+    entries: list  # practice event documents
+    total: int     # answers matching the filters, on every page
+
+
+# Latest session snapshot of a learner; event_id is the last event folded into it
+class Snapshot(NamedTuple):
+    event_id: int
+    current_frame: str
+    frames: bytes
+    practice: bytes
+
+
+_INSERT_EVENT = "INSERT INTO events (event, name, frame, result, timestamp, data) VALUES (?, ?, ?, ?, ?, ?)"
+# Fields every event needs, and those the aggregates read for some events
+REQUIRED_FIELDS = ("event", "name", "timestamp")
+EVENT_FIELDS = {"response": ("frame",), "mastery": ("concept", "mastered")}
+
+
+class EventStore:
+    def __init__(self, path=EVENT_DB_PATH, batch_size=WRITE_BATCH_SIZE, batch_window=WRITE_BATCH_WINDOW):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.last_error = None  # the last failure that lost events
+        self.dropped = 0
+        self._local = threading.local()
+        self._queue = queue.SimpleQueue()
+        self._pending = Counter()
+        self._committed = threading.Condition()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(SCHEMA)
+        self._rebuild_aggregates(conn)
+        threading.Thread(target=self._write_loop, name="event-writer", daemon=True).start()
+        atexit.register(self.flush)
+
+    # One connection per Streamlit script thread; sqlite3 connections are not
+    # safe to share between threads.
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def insert(self, doc):
+        # Checked and serialised here so a bad document fails in the caller, not the writer
+        missing = [
+            field for field in (*REQUIRED_FIELDS, *EVENT_FIELDS.get(doc.get("event"), ()))
+            if doc.get(field) is None
+        ]
+        if missing:
+            raise ValueError(f"{doc.get('event')!r} event is missing {', '.join(missing)}")
+        row = (
+            doc["event"],
+            doc["name"],
+            doc.get("frame"),
+            doc.get("result"),
+            doc["timestamp"],
+            json.dumps(doc, ensure_ascii=False),
+        )
+        with self._committed:
+            self._pending[doc["name"]] += 1
+        self._queue.put((row, json.loads(row[-1])))
+
+    @timed("event_store.flush")
+    def flush(self, name=None, timeout=FLUSH_TIMEOUT):
+        # Blocks until the queued events of one learner (or of everyone) are
+        # committed; False if the writer is still behind after timeout seconds
+        with self._committed:
+            return self._committed.wait_for(
+                lambda: not (self._pending[name] if name is not None else self._pending), timeout
+            )
+
+    # -------------------- Background writer -------------------- #
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self._report(len(batch), e)
+            finally:
+                # Written or dropped, the events no longer hold up flush()
+                with self._committed:
+                    for _, doc in batch:
+                        self._pending[doc["name"]] -= 1
+                        if not self._pending[doc["name"]]:
+                            del self._pending[doc["name"]]
+                    self._committed.notify_all()
+
+    def _write_batch(self, batch):
+        # One transaction per batch, one savepoint per event: an event the
+        # aggregates cannot take is rolled back and reported on its own
+        conn = self._conn()
+        for attempt in range(WRITE_RETRIES + 1):
+            rejected = []
+            try:
+                with conn:
+                    conn.execute("BEGIN")
+                    for row, doc in batch:
+                        conn.execute("SAVEPOINT event")
+                        try:
+                            conn.execute(_INSERT_EVENT, row)
+                            self._update_progress(conn, doc)
+                        except sqlite3.OperationalError:
+                            raise
+                        except Exception as e:
+                            conn.execute("ROLLBACK TO event")
+                            rejected.append(e)
+                        conn.execute("RELEASE event")
+            except sqlite3.OperationalError as e:
+                # Still locked after busy_timeout; keep the batch and try again
+                if attempt == WRITE_RETRIES:
+                    raise
+                time.sleep(1)
+                continue
+            for e in rejected:
+                self._report(1, e)
+            return
+
+    def _report(self, count, error):
+        # Shown on the teacher dashboard and in the server log
+        self.dropped += count
+        self.last_error = error
+        warnings.warn(f"event store dropped {count} event(s): {error!r}")
+
+    # Stores written before the current aggregates existed are rebuilt from
+    # the event log once; the immediate transaction keeps concurrently
+    # starting workers from rebuilding twice.
+    def _rebuild_aggregates(self, conn):
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= AGGREGATES_VERSION:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < AGGREGATES_VERSION:
+                for table in AGGREGATE_TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+                for row in conn.execute("SELECT data FROM events ORDER BY id").fetchall():
+                    self._update_progress(conn, json.loads(row["data"]))
+                conn.execute(f"PRAGMA user_version = {AGGREGATES_VERSION}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    # Keeps learner_progress and the class aggregates in step with the event
+    # log: O(1) per event, in the same transaction as the insert.
+    def _update_progress(self, conn, doc):
+        name = doc["name"]
+        event = doc["event"]
+        if conn.execute("INSERT OR IGNORE INTO learner_progress (name) VALUES (?)", (name,)).rowcount:
+            self._bump(conn, "class_totals", {"key": "learners"}, value=1)
+            self._bump(conn, "mastery_histogram", {"mastered_concepts": 0}, learners=1)
+        if event == "response":
+            frame = doc["frame"]
+            conn.execute("UPDATE learner_progress SET responses = responses + 1 WHERE name = ?", (name,))
+            correct = str(doc.get("result", "")).lower() == "correct"
+            self._bump(conn, "frame_stats", {"frame": frame}, responses=1, correct=int(correct))
+            if self._mark(conn, name, "frame_reached", frame, True):
+                self._bump(conn, "frame_stats", {"frame": frame}, reached=1)
+            if correct and self._mark(conn, name, "frame", frame, True):
+                conn.execute(
+                    "UPDATE learner_progress SET completed_frames = completed_frames + 1 WHERE name = ?", (name,)
+                )
+                self._bump(conn, "frame_stats", {"frame": frame}, completed=1)
+            elif not correct:
+                self._bump(conn, "remedial_hits", {"frame": frame, "answer": str(doc.get("selected_answer"))}, hits=1)
+        elif event == "practice":
+            conn.execute(
+                "UPDATE learner_progress SET practice_answers = practice_answers + 1 WHERE name = ?", (name,)
+            )
+            if doc.get("question_id"):
+                self._bump(
+                    conn, "question_stats", {"question_id": doc["question_id"]},
+                    answers=1, correct=int(bool(doc.get("correct"))),
+                )
+        elif event == "mastery":
+            if self._mark(conn, name, "concept", doc["concept"], doc["mastered"]):
+                delta = 1 if doc["mastered"] else -1
+                self._bump(conn, "concept_stats", {"concept": doc["concept"]}, mastered=delta)
+                self._set_mastered_count(conn, name, lambda n: n + delta)
+        elif event == "practice_reset":
+            concepts = conn.execute(
+                "SELECT key FROM learner_completed WHERE name = ? AND kind = 'concept'", (name,)
+            ).fetchall()
+            for (concept,) in concepts:
+                self._bump(conn, "concept_stats", {"concept": concept}, mastered=-1)
+            conn.execute("DELETE FROM learner_completed WHERE name = ? AND kind = 'concept'", (name,))
+            conn.execute("UPDATE learner_progress SET practice_answers = 0 WHERE name = ?", (name,))
+            self._set_mastered_count(conn, name, lambda n: 0)
+
+    def _set_mastered_count(self, conn, name, update):
+        # Moves the learner between mastery_histogram buckets as well
+        (old,) = conn.execute("SELECT mastered_concepts FROM learner_progress WHERE name = ?", (name,)).fetchone()
+        new = update(old)
+        if new != old:
+            conn.execute("UPDATE learner_progress SET mastered_concepts = ? WHERE name = ?", (new, name))
+            self._bump(conn, "mastery_histogram", {"mastered_concepts": old}, learners=-1)
+            self._bump(conn, "mastery_histogram", {"mastered_concepts": new}, learners=1)
+
+    def _bump(self, conn, table, key, **counters):
+        # Upsert adding counters to the row identified by key
+        columns = [*key, *counters]
+        conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET "
+            + ", ".join(f"{c} = {c} + excluded.{c}" for c in counters),
+            [*key.values(), *counters.values()],
+        )
+
+    def _mark(self, conn, name, kind, key, done):
+        if done:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO learner_completed (name, kind, key) VALUES (?, ?, ?)", (name, kind, key)
+            )
+        else:
+            cur = conn.execute(
+                "DELETE FROM learner_completed WHERE name = ? AND kind = ? AND key = ?", (name, kind, key)
+            )
+        return cur.rowcount > 0
+
+    @timed("event_store.progress")
+    def progress(self, name):
+        self.flush(name)
+        row = self._conn().execute(
+            "SELECT responses, completed_frames, practice_answers, mastered_concepts "
+            "FROM learner_progress WHERE name = ?",
+            (name,),
+        ).fetchone()
+        return LearnerProgress(*row) if row else LearnerProgress()
+
+    def events(self, name, event=None):
+        self.flush(name)
+        if event is None:
+            rows = self._conn().execute(
+                "SELECT data FROM events WHERE name = ? ORDER BY id", (name,)
+            )
+        else:
+            rows = self._conn().execute(
+                "SELECT data FROM events WHERE name = ? AND event = ? ORDER BY id", (name, event)
+            )
+        return [json.loads(row["data"]) for row in rows]
+
+    def last_event(self, name, event):
+        self.flush(name)
+        row = self._conn().execute(
+            "SELECT data FROM events WHERE name = ? AND event = ? ORDER BY id DESC LIMIT 1", (name, event)
+        ).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def has_events(self, name, event):
+        self.flush(name)
+        row = self._conn().execute(
+            "SELECT 1 FROM events WHERE name = ? AND event = ? LIMIT 1", (name, event)
+        ).fetchone()
+        return row is not None
+
+    def frame_events(self, name, frame):
+        self.flush(name)
+        rows = self._conn().execute(
+            "SELECT data FROM events WHERE name = ? AND frame = ? ORDER BY id", (name, frame)
+        )
+        return [json.loads(row["data"]) for row in rows]
+
+    @timed("event_store.practice_history")
+    def practice_history(self, name, correct=None, concept=None, limit=10, offset=0):
+        # The learner's practice answers since their last practice_reset (the
+        # answers of the current round, like the in-memory history), filtered
+        # and paged in SQL so only the visible page is decoded
+        self.flush(name)
+        where = (
+            "name = ? AND event = 'practice' AND id > COALESCE("
+            "(SELECT MAX(id) FROM events WHERE name = ? AND event = 'practice_reset'), 0)"
+        )
+        params = [name, name]
+        if correct is not None:
+            where += " AND json_extract(data, '$.correct') = ?"
+            params.append(int(correct))
+        if concept is not None:
+            where += " AND json_extract(data, '$.concept') = ?"
+            params.append(concept)
+        conn = self._conn()
+        (total,) = conn.execute(f"SELECT COUNT(*) FROM events WHERE {where}", params).fetchone()
+        rows = conn.execute(
+            f"SELECT data FROM events WHERE {where} ORDER BY id DESC LIMIT ? OFFSET ?", [*params, limit, offset]
+        )
+        return HistoryPage([json.loads(row["data"]) for row in rows], total)
+
+    def completed_frames(self, name):
+        return self.progress(name).completed_frames
+
+    def save_snapshot(self, name, event_id, current_frame, frames, practice, timestamp):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO learner_snapshots "
+                "(name, event_id, current_frame, frames, practice, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, event_id, current_frame, frames, practice, timestamp),
+            )
+
+    def snapshot(self, name):
+        row = self._conn().execute(
+            "SELECT event_id, current_frame, frames, practice FROM learner_snapshots WHERE name = ?", (name,)
+        ).fetchone()
+        return Snapshot(*row) if row else None
+
+    def events_after(self, name, event_id):
+        # (id, doc) pairs logged after event_id, oldest first
+        self.flush(name)
+        rows = self._conn().execute(
+            "SELECT id, data FROM events WHERE name = ? AND id > ? ORDER BY id", (name, event_id)
+        )
+        return [(row["id"], json.loads(row["data"])) for row in rows]
+
+    def events_since(self, event_id, limit):
+        # (id, doc) pairs of every learner after event_id, for exports; committed events only
+        rows = self._conn().execute(
+            "SELECT id, data FROM events WHERE id > ? ORDER BY id LIMIT ?", (event_id, limit)
+        )
+        return [(row["id"], json.loads(row["data"])) for row in rows]
+
+    def snapshot_lag(self, name):
+        # (events committed since the learner's snapshot, id of the newest one);
+        # does not wait for queued events
+        count, last = self._conn().execute(
+            "SELECT COUNT(id), MAX(id) FROM events WHERE name = ? AND id > "
+            "COALESCE((SELECT event_id FROM learner_snapshots WHERE name = ?), 0)",
+            (name, name),
+        ).fetchone()
+        return count, last
+
+    @timed("event_store.class_stats")
+    def class_stats(self):
+        # Reads only the class aggregates; events still queued appear after the next batch
+        conn = self._conn()
+        learners = conn.execute("SELECT value FROM class_totals WHERE key = 'learners'").fetchone()
+        return ClassStats(
+            learners=learners[0] if learners else 0,
+            frames={
+                row[0]: tuple(row[1:])
+                for row in conn.execute("SELECT frame, responses, correct, reached, completed FROM frame_stats")
+            },
+            remedial_hits=[
+                tuple(row)
+                for row in conn.execute("SELECT frame, answer, hits FROM remedial_hits ORDER BY hits DESC")
+            ],
+            concepts=dict(conn.execute("SELECT concept, mastered FROM concept_stats").fetchall()),
+            mastery_histogram=dict(conn.execute(
+                "SELECT mastered_concepts, learners FROM mastery_histogram WHERE learners > 0 ORDER BY mastered_concepts"
+            ).fetchall()),
+            questions={
+                row[0]: (row[1], row[2])
+                for row in conn.execute("SELECT question_id, answers, correct FROM question_stats")
+            },
+        )
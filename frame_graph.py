@@ -0,0 +1,106 @@
+# Compiled frame graph
+#
+# The Main_frame/Remedial_frame content as an adjacency structure, built once
+# per content version (see get_content() in the scripts) so a rerun looks
+# frames up in plain dicts instead of indexing the DataFrame:
+#   rows[frame]                    the frame's cells
+#   options[frame]                 parsed FrameOptions (main frames only)
+#   successors[frame]              where the learner can go next
+#   returns_to[(remedial, frame)]  where "Return to Main Frame" leads
+#   reachable                      frames reachable from the start frame
+#   depth[frame]                   correct answers left to complete the path
+#   prefetch[frame]                origins of the next frames' links
+from collections import deque
+from html import escape
+from urllib.parse import urlsplit
+
+from content_bundle import COMPLETE, START_FRAME
+
+LINK_COLUMNS = ("video", "notes", "extra_info")
+
+
+def link_origin(url):
+    if not isinstance(url, str):
+        return None
+    parts = urlsplit(url.strip())
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def link_hints(origins):
+    # Lets the browser open connections to the next frames' video and
+    # document hosts while the learner is still reading this one
+    return "".join(f'<link rel="preconnect" href="{escape(origin)}" crossorigin>' for origin in origins)
+
+
+class FrameGraph:
+    __slots__ = (
+        "frames", "start", "rows", "main_frames", "options", "successors",
+        "returns_to", "reachable", "depth", "prefetch",
+    )
+
+    def __init__(self, frames, start=START_FRAME):
+        self.frames = frames
+        self.start = start
+        self.rows = frames.drop(columns="options").to_dict("index")
+        self.main_frames = tuple(frames.index[frames["source"] == "Main_frame"])
+        self.options = {frame: options for frame, options in frames["options"].items() if options}
+
+        # A remedial frame goes back to main_frame_<n> of the frame that sent the learner
+        self.returns_to = {}
+        successors = {}
+        for frame, options in self.options.items():
+            successors.setdefault(frame, {}).update(dict.fromkeys(opt.next_step for opt in options))
+            for opt in options:
+                if not opt.is_correct:
+                    back = "main_frame_" + frame.split("_")[-1]
+                    self.returns_to[opt.next_step, frame] = back
+                    successors.setdefault(opt.next_step, {})[back] = None
+        self.successors = {frame: tuple(steps) for frame, steps in successors.items()}
+
+        self.reachable = self._reachable(start)
+        self.depth = self._depth()
+        self.prefetch = {
+            frame: tuple(dict.fromkeys(
+                origin
+                for step in steps if step in self.rows
+                for origin in map(link_origin, (self.rows[step].get(col) for col in LINK_COLUMNS))
+                if origin
+            ))
+            for frame, steps in self.successors.items()
+        }
+
+    def _reachable(self, start):
+        seen = {start} if start in self.rows else set()
+        queue = deque(seen)
+        while queue:
+            for step in self.successors.get(queue.popleft(), ()):
+                if step in self.rows and step not in seen:
+                    seen.add(step)
+                    queue.append(step)
+        return frozenset(seen)
+
+    def _depth(self):
+        # Breadth-first from COMPLETE backwards along correct answers
+        leads_to = {}
+        for frame, options in self.options.items():
+            for opt in options:
+                if opt.is_correct:
+                    leads_to.setdefault(opt.next_step, []).append(frame)
+        depth = {COMPLETE: 0}
+        queue = deque([COMPLETE])
+        while queue:
+            step = queue.popleft()
+            for frame in leads_to.get(step, ()):
+                if frame not in depth:
+                    depth[frame] = depth[step] + 1
+                    queue.append(frame)
+        del depth[COMPLETE]
+        return depth
+
+    def __contains__(self, frame):
+        return frame in self.rows
+
+    def return_frame(self, remedial, frame):
+        return self.returns_to.get((remedial, frame), frame)
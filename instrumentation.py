@@ -0,0 +1,221 @@
+# Hot-path instrumentation
+#
+# span("name") (or the @timed decorator) times a block into process-wide
+# histograms of wall time and CPU time.  Every Streamlit rerun runs on a
+# script thread of its own, so the thread CPU time is that rerun's alone and
+# the gap to wall time is waiting: locks, the event writer, I/O.  The spans
+# of the current rerun are also kept per thread for the debug overlay
+# (show_timings(), enabled with ?debug=1 or BPI_DEBUG_OVERLAY=1).
+#
+# Histograms are exported in the Prometheus text format and as JSON:
+#   BPI_METRICS_PORT=9464      serve /metrics and /metrics.json
+#   BPI_METRICS_FILE=path      rewrite the file every BPI_METRICS_INTERVAL
+#                              seconds (JSON when it ends in .json; {pid} is
+#                              replaced by the process id)
+import json
+import os
+import threading
+import time
+import warnings
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = os.environ.get("BPI_METRICS_PORT")
+METRICS_FILE = os.environ.get("BPI_METRICS_FILE")
+METRICS_INTERVAL = float(os.environ.get("BPI_METRICS_INTERVAL", "10"))
+DEBUG_OVERLAY = os.environ.get("BPI_DEBUG_OVERLAY") == "1"
+
+# Upper bounds in seconds, as in a Prometheus histogram
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CLOCKS = ("wall", "cpu")
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+
+_histograms = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+# -------------------- Recording -------------------- #
+def _observe(name, wall, cpu):
+    with _lock:
+        histograms = _histograms.get(name)
+        if histograms is None:
+            histograms = _histograms[name] = (Histogram(), Histogram())
+        histograms[0].observe(wall)
+        histograms[1].observe(cpu)
+
+
+@contextmanager
+def span(name):
+    spans = getattr(_local, "spans", None)
+    entry = None
+    if spans is not None:
+        # Appended on entry so the overlay lists spans in start order
+        entry = [name, _local.depth, 0.0, 0.0]
+        spans.append(entry)
+        _local.depth += 1
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+        _observe(name, wall, cpu)
+        if entry is not None:
+            entry[2], entry[3] = wall, cpu
+            _local.depth -= 1
+
+
+def timed(name=None):
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_rerun():
+    # Called at the top of a script run; the run's total is recorded by
+    # show_timings() at the bottom, so runs cut short by st.rerun() only
+    # show up in their page spans
+    _local.spans = []
+    _local.depth = 0
+    _local.started = time.perf_counter(), time.thread_time()
+
+
+def end_rerun():
+    started = getattr(_local, "started", None)
+    spans = getattr(_local, "spans", None) or []
+    _local.spans = _local.started = None
+    if started is None:
+        return None, spans
+    wall, cpu = time.perf_counter() - started[0], time.thread_time() - started[1]
+    _observe("rerun", wall, cpu)
+    return (wall, cpu), spans
+
+
+# -------------------- Export -------------------- #
+def snapshot():
+    with _lock:
+        return {
+            name: {
+                clock: {"count": h.count, "sum": h.sum, "buckets": dict(zip(BUCKETS + ("+Inf",), h.cumulative()))}
+                for clock, h in zip(CLOCKS, histograms)
+            }
+            for name, histograms in sorted(_histograms.items())
+        }
+
+
+def prometheus_text():
+    lines = []
+    for clock in CLOCKS:
+        metric = f"bpi_span_{clock}_seconds"
+        lines.append(f"# HELP {metric} {clock.capitalize()} time spent in each named span.")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, clocks in snapshot().items():
+            h = clocks[clock]
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for bound, count in h["buckets"].items():
+                lines.append(f'{metric}_bucket{{span="{label}",le="{bound}"}} {count}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {h["sum"]:.6f}')
+            lines.append(f'{metric}_count{{span="{label}"}} {h["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = prometheus_text().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(snapshot()).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_metrics(path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(snapshot()) if path.endswith(".json") else prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def _write_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_metrics(path)
+        except OSError:
+            pass
+
+
+_exporters_started = False
+
+
+def start_exporters(port=METRICS_PORT, path=METRICS_FILE, interval=METRICS_INTERVAL):
+    # Once per process; a no-op unless BPI_METRICS_PORT or BPI_METRICS_FILE is set
+    global _exporters_started
+    with _lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    if port:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsHandler)
+        except OSError as e:
+            # Metrics are never worth taking the app down for
+            warnings.warn(f"metrics endpoint not started on port {port}: {e}")
+        else:
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    if path:
+        threading.Thread(
+            target=_write_loop, args=(path.format(pid=os.getpid()), interval), name="metrics-file", daemon=True
+        ).start()
+
+
+# -------------------- Debug overlay -------------------- #
+def show_timings(enabled=False):
+    # Ends the rerun; renders its spans below the page when enabled
+    total, spans = end_rerun()
+    if not (enabled or DEBUG_OVERLAY) or total is None:
+        return
+    import pandas as pd
+    import streamlit as st
+
+    rows = [("rerun", total[0] * 1000, total[1] * 1000)]
+    rows += [("\u2003" * (depth + 1) + name, wall * 1000, cpu * 1000) for name, depth, wall, cpu in spans]
+    with st.expander("⏱️ Rerun timings", expanded=True):
+        st.dataframe(pd.DataFrame(rows, columns=["span", "wall_ms", "cpu_ms"]).round(2), hide_index=True)
@@ -0,0 +1,223 @@
+# Concept graph rendering for the practice pages
+#
+# Node positions depend only on the graph structure, so they are computed once
+# per structure with a seeded layout and cached for the life of the process.
+# The figures themselves are cached as PNGs keyed on what they show (node
+# statuses, progress values), so a rerun whose learner state has not changed
+# since the last draw, or matches another learner's, reuses the image.
+#
+# Two renderers are available, picked with BPI_GRAPH_RENDERER:
+#   matplotlib (default)  server-side PNG via st.pyplot
+#   client                JSON payload drawn in the browser by
+#                         concept_graph_component/index.html
+import hashlib
+import io
+import os
+from functools import lru_cache
+
+import matplotlib.pyplot as plt
+import networkx as nx
+import streamlit as st
+import streamlit.components.v1 as components
+
+from instrumentation import timed
+
+LAYOUT_SEED = 7
+# Same output as st.pyplot
+SAVEFIG_OPTIONS = {"bbox_inches": "tight", "dpi": 200, "format": "png"}
+GRAPH_RENDERER = os.environ.get("BPI_GRAPH_RENDERER", "matplotlib")
+
+_concept_graph_component = components.declare_component(
+    "concept_graph",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "concept_graph_component"),
+)
+
+
+# Helper function to split text into multiple lines
+@lru_cache(maxsize=1024)
+def split_text(text, max_length=15):
+    words = text.split()
+    lines = []
+    current_line = []
+    current_length = 0
+    for word in words:
+        if current_length + len(word) + 1 > max_length:
+            lines.append(" ".join(current_line))
+            current_line = [word]
+            current_length = len(word)
+        else:
+            current_line.append(word)
+            current_length += len(word) + 1
+    if current_line:
+        lines.append(" ".join(current_line))
+    return "\n".join(lines)
+
+
+def graph_structure(graph):
+    # Hashable key: nodes in declaration order and edges whose ends are both shown
+    nodes = tuple(graph)
+    edges = tuple(
+        (prereq, concept)
+        for concept, data in graph.items()
+        for prereq in data["prerequisite"]
+        if prereq in graph  # Ensure the prerequisite is in the filtered graph
+    )
+    return nodes, edges
+
+
+@lru_cache(maxsize=64)
+def graph_layout(structure, scale=1.5):
+    nodes, edges = structure
+    G = nx.DiGraph()
+    G.add_nodes_from(nodes)
+    G.add_edges_from(edges)
+    pos = nx.spring_layout(G, scale=scale, seed=LAYOUT_SEED) if nodes else {}
+    return G, pos
+
+
+def figure_png(fig):
+    try:
+        image = io.BytesIO()
+        fig.savefig(image, **SAVEFIG_OPTIONS)
+        return image.getvalue()
+    finally:
+        # Long-lived workers would otherwise keep every figure in pyplot's registry
+        plt.close(fig)
+
+
+@lru_cache(maxsize=128)
+def graph_png(structure, status, node_size=1500, figsize=(8, 6), scale=1.5):
+    # status: (is_current, is_mastered) per node, in structure order
+    # The cached graph and positions are shared between sessions; never mutate them
+    G, pos = graph_layout(structure, scale)
+    status = dict(zip(structure[0], status))
+
+    node_colors = []
+    labels = {}
+    for concept in G.nodes:
+        current, mastered = status.get(concept, (False, False))
+        label_status = "✅" if mastered else "🕗"
+        labels[concept] = split_text(f"{concept} {label_status}")  # Split label into multiple lines
+        if current:
+            node_colors.append("gold")
+        elif mastered:
+            node_colors.append("lightgreen")
+        else:
+            node_colors.append("lightcoral")
+
+    # Adjust font size dynamically based on the length of the longest label
+    max_label_length = max(len(label.replace("\n", "")) for label in labels.values())
+    font_size = max(6, 8 - (max_label_length // 10))  # Reduce font size for longer labels
+
+    fig, ax = plt.subplots(figsize=figsize)
+    nx.draw(
+        G,
+        pos,
+        labels=labels,
+        node_color=node_colors,
+        node_size=node_size,
+        font_size=font_size,  # Use dynamically calculated font size
+        ax=ax
+    )
+    return figure_png(fig)
+
+
+def plot_knowledge_graph(graph, is_mastered, current_concept=None, node_size=1500, figsize=(8, 6), scale=1.5):
+    if not graph:
+        st.info("No concepts to show.")
+        return
+    structure = graph_structure(graph)
+    status = tuple((concept == current_concept, bool(is_mastered(concept))) for concept in structure[0])
+    st.image(graph_png(structure, status, node_size, figsize, scale), width="stretch")
+
+
+@lru_cache(maxsize=256)
+def progress_chart_png(concepts, progress):
+    # progress per concept: 1.0 mastered, 0.5 in progress, 0.0 not started
+    fig, ax = plt.subplots(figsize=(4, 2))
+    ax.barh(concepts, progress, color=["lightgreen" if p == 1.0 else "gold" if p == 0.5 else "lightcoral" for p in progress])
+    ax.set_xlim(0, 1)
+    ax.set_xlabel("Progress")
+    ax.set_title("Concept Mastery Progress")
+    ax.set_yticks(range(len(concepts)))
+    ax.set_yticklabels(concepts)
+    return figure_png(fig)
+
+
+# -------------------- Client-side renderer -------------------- #
+@lru_cache(maxsize=64)
+def graph_payload(structure, scale=1.5):
+    # Node positions normalised to [0.05, 0.95] so the browser can scale them
+    _, pos = graph_layout(structure, scale)
+    nodes, edges = structure
+    if not nodes:
+        return {"key": "empty", "nodes": [], "edges": []}
+    xs = [pos[n][0] for n in nodes]
+    ys = [pos[n][1] for n in nodes]
+    span_x = (max(xs) - min(xs)) or 1.0
+    span_y = (max(ys) - min(ys)) or 1.0
+    return {
+        "key": hashlib.sha1(repr(structure).encode()).hexdigest()[:12],
+        "nodes": [
+            {
+                "id": n,
+                "x": round(0.05 + 0.9 * (pos[n][0] - min(xs)) / span_x, 4),
+                "y": round(0.05 + 0.9 * (max(ys) - pos[n][1]) / span_y, 4),
+            }
+            for n in nodes
+        ],
+        "edges": [list(edge) for edge in edges],
+    }
+
+
+def concept_status(graph, is_mastered, current_concept=None):
+    return {
+        concept: "current" if concept == current_concept
+        else "mastered" if is_mastered(concept)
+        else "pending"
+        for concept in graph
+    }
+
+
+def render_knowledge_graph_client(graph, is_mastered, current_concept=None, key="concept_graph"):
+    # The browser keeps the structure and current statuses between reruns, so
+    # normally only changed statuses are sent.  A full payload goes out on the
+    # first render, when the graph changes, when the component was unmounted
+    # in the previous run, or when the browser asks for a resync.
+    payload = graph_payload(graph_structure(graph))
+    status = concept_status(graph, is_mastered, current_concept)
+    sent_key = f"_{key}_sent"
+    sent = st.session_state.get(sent_key)
+    request = st.session_state.get(key) or {}
+    full = (
+        sent is None
+        or key not in st.session_state
+        or sent["structure_key"] != payload["key"]
+        or request.get("resync", sent["resync"]) != sent["resync"]
+    )
+    if full:
+        version = sent["version"] + 1 if sent else 0
+        args = {"structure": payload, "status": status, "full_status": True, "base_version": -1}
+    else:
+        diff = {c: s for c, s in status.items() if sent["status"].get(c) != s}
+        version = sent["version"] + 1 if diff else sent["version"]
+        args = {"structure": None, "status": diff, "full_status": False, "base_version": sent["version"]}
+    _concept_graph_component(structure_key=payload["key"], version=version, key=key, default=None, **args)
+    st.session_state[sent_key] = {
+        "structure_key": payload["key"],
+        "status": status,
+        "version": version,
+        "resync": request.get("resync"),
+    }
+
+
+@timed()
+def show_knowledge_graph(graph, is_mastered, current_concept=None, **plot_kwargs):
+    if GRAPH_RENDERER == "client":
+        # Filtering to pending concepts happens in the browser
+        render_knowledge_graph_client(graph, is_mastered, current_concept)
+        return
+    filter_pending = st.checkbox("🔍 Show only pending concepts", value=False)
+    if filter_pending:
+        graph = {k: v for k, v in graph.items() if not is_mastered(k)}
+    plot_knowledge_graph(graph, is_mastered, current_concept=current_concept, **plot_kwargs)
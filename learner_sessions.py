@@ -0,0 +1,137 @@
+# Resumable learner sessions
+#
+# A learner's session state (current frame, frame log and practice state) is
+# rebuilt at login from the latest snapshot in the event store plus the
+# learner's events logged after it.  The events table is the write-ahead log:
+# every response, practice answer, mastery change and reset is appended there
+# as it happens, and practice events carry the per-concept changes they
+# caused, so replaying them needs neither the UI nor the redirection map.
+# A snapshot is written once SNAPSHOT_EVERY events have piled up (and on
+# logout, which also flushes the learner's queued events), which keeps the
+# replayed tail short.
+from datetime import datetime
+
+from adaptive_engine import FrameLog, LearnerState, update_mastery
+from content_bundle import START_FRAME
+from instrumentation import timed
+
+SNAPSHOT_EVERY = 20
+
+
+class LearnerSession:
+    __slots__ = ("current_frame", "frame_log", "learner", "event_id")
+
+    def __init__(self, current_frame, frame_log, learner, event_id=0):
+        self.current_frame = current_frame
+        self.frame_log = frame_log
+        self.learner = learner
+        self.event_id = event_id
+
+
+class LearnerSessions:
+    def __init__(self, store, concept_graph, question_index, load_frame_graph, snapshot_every=SNAPSHOT_EVERY):
+        # load_frame_graph returns the FrameGraph currently being served, so
+        # sessions restored after a content reload see the new frames
+        self.store = store
+        self.concept_graph = concept_graph
+        self.question_index = question_index
+        self.load_frame_graph = load_frame_graph
+        self.snapshot_every = snapshot_every
+
+    def new_session(self, graph=None):
+        graph = graph or self.load_frame_graph()
+        return LearnerSession(
+            START_FRAME, FrameLog(graph.frames.index), LearnerState(self.concept_graph, self.question_index)
+        )
+
+    def _from_snapshot(self, snapshot, graph):
+        session = self.new_session(graph)
+        session.event_id = snapshot.event_id
+        if snapshot.current_frame in graph:
+            session.current_frame = snapshot.current_frame
+        if snapshot.frames is not None:
+            session.frame_log = FrameLog.from_bytes(graph.frames.index, snapshot.frames)
+        if snapshot.practice is not None:
+            session.learner = LearnerState.from_bytes(self.concept_graph, self.question_index, snapshot.practice)
+        return session
+
+    @timed("learner_sessions.restore")
+    def restore(self, name):
+        # One graph for the whole restore, even if new content lands meanwhile
+        graph = self.load_frame_graph()
+        snapshot = self.store.snapshot(name)
+        session = None
+        if snapshot is not None:
+            try:
+                session = self._from_snapshot(snapshot, graph)
+            except ValueError:
+                # Content changed since the snapshot; rebuild from the whole log
+                session = None
+        if session is None:
+            session = self.new_session(graph)
+        for event_id, doc in self.store.events_after(name, session.event_id):
+            self._replay(session, doc, graph)
+            session.event_id = event_id
+        return session
+
+    def _replay(self, session, doc, graph):
+        event = doc["event"]
+        if event == "response":
+            frame = doc.get("frame")
+            if frame not in graph:
+                return
+            options = graph.options.get(frame, ())
+            matched = next((opt for opt in options if opt.ans == doc.get("selected_answer")), None)
+            self._answer(session, frame, matched, graph)
+        elif event == "practice":
+            question = self.question_index.by_id.get(doc.get("question_id"))
+            if question is None:
+                return
+            learner = session.learner
+            learner.answered.add(question["question_id"])
+            learner.record_answer(question, doc.get("answer"), doc.get("correct", False))
+            learner.apply_changes(doc.get("changes", ()))
+        elif event == "mastery":
+            if doc["concept"] in self.concept_graph:
+                update_mastery(session.learner, doc["concept"], doc["mastered"])
+                if doc["mastered"]:
+                    session.learner.set_level(doc["concept"], None)
+        elif event == "practice_reset":
+            session.learner = LearnerState(self.concept_graph, self.question_index)
+
+    def _answer(self, session, frame, option, graph):
+        # A correct answer is followed by "Next"; a wrong one returns to this frame after the remedial
+        if option is not None and option.is_correct and option.next_step in graph:
+            if session.frame_log is not None:
+                session.frame_log.complete(frame)
+            session.current_frame = option.next_step
+        else:
+            session.current_frame = frame
+
+    @timed("learner_sessions.checkpoint")
+    def checkpoint(self, name, current_frame, learner, frame_log=None, force=False, answered=None):
+        # Returns True when a snapshot was written.  The learner's queued
+        # events are flushed first so the snapshot's event_id covers every
+        # event already folded into the in-memory state.
+        # answered is the option checked on current_frame while its "Next" is
+        # pending.  Its response is already in the log, so the snapshot stores
+        # the state that replaying it gives, the same as a full replay.
+        if not force and self.store.snapshot_lag(name)[0] < self.snapshot_every:
+            return False
+        self.store.flush(name)
+        lag, last_event_id = self.store.snapshot_lag(name)
+        if not lag:
+            return False
+        if answered is not None:
+            session = LearnerSession(current_frame, frame_log.copy() if frame_log is not None else None, learner)
+            self._answer(session, current_frame, answered, self.load_frame_graph())
+            current_frame, frame_log = session.current_frame, session.frame_log
+        self.store.save_snapshot(
+            name,
+            last_event_id,
+            current_frame,
+            frame_log.to_bytes() if frame_log is not None else None,
+            learner.to_bytes() if learner is not None else None,
+            datetime.now().isoformat(),
+        )
+        return True
@@ -0,0 +1,276 @@
+# Offline load test
+#
+# Drives the real app scripts through Streamlit's AppTest, the way a browser
+# session would: login -> frames (correct and incorrect options, remedial
+# frames and back) -> practice questions (through the redirection map in the
+# adaptive scripts) -> logout.  Every simulated student is a separate session
+# sharing the process's caches and one event store, like users of one
+# worker; --processes runs several such workers against the same database.
+# AppTest sets up process-wide runtime state for each run, so the reruns of
+# one process are serialised, much as a worker's GIL serialises script
+# threads.  Rerun latency is timed once a rerun holds that lock; the wait for
+# it is reported separately.  Reports rerun latency percentiles per step, the
+# lock wait, the error rate and the memory held per open session.
+# No network or browser is needed.
+#
+#   python loadtest.py app.py --students 200 --threads 8
+#   python loadtest.py adaptive_practice_adaptive_logic_applied.py --processes 4 --threads 4 --students 1000
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from content_bundle import COMPLETE, CONTENT_PATH, load_frames
+from frame_graph import FrameGraph
+from practice_content import ADAPTIVE_QUESTION_BANK_PATH, QUESTION_BANK_PATH, load_question_bank
+
+PERCENTILES = (50, 95, 99)
+_rerun_lock = threading.Lock()
+
+
+class JourneyError(Exception):
+    def __init__(self, step, message):
+        super().__init__(f"{step}: {message}")
+        self.step = step
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# -------------------- Journey -------------------- #
+class Student:
+    def __init__(self, script, name, graph, answers, rng, p_correct, practice_answers, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(script, default_timeout=timeout)
+        self.name = name
+        self.graph = graph
+        self.answers = answers
+        self.rng = rng
+        self.p_correct = p_correct
+        self.practice_answers = practice_answers
+        self.timings = []
+        self.waits = []
+
+    def run(self, step, widget=None):
+        queued = time.perf_counter()
+        with _rerun_lock:
+            start = time.perf_counter()
+            (widget or self.at).run()
+            end = time.perf_counter()
+        self.waits.append(start - queued)
+        self.timings.append((step, end - start))
+        if self.at.exception:
+            raise JourneyError(step, self.at.exception[0].message)
+
+    def button(self, *labels):
+        return next((b for b in self.at.button if any(label in b.label for label in labels)), None)
+
+    def click(self, step, *labels):
+        button = self.button(*labels)
+        if button is None:
+            raise JourneyError(step, f"no {' / '.join(labels)!r} button on page {self.at.session_state.page!r}")
+        self.run(step, button.click())
+
+    def login(self):
+        self.run("load")
+        self.at.text_input[0].input(self.name)
+        self.at.number_input[0].set_value(self.rng.randint(10, 16))
+        self.at.selectbox[0].select(self.rng.choice(["Male", "Female", "Other"]))
+        self.click("login", "Login")
+
+    def frames(self):
+        self.click("start_frames", "Start Learning", "Continue Learning")
+        for _ in range(4 * len(self.graph.main_frames)):
+            frame = self.at.session_state.current_frame
+            self.click("review", "Review Now")
+            options = self.graph.options[frame]
+            correct = [opt for opt in options if opt.is_correct]
+            wrong = [opt for opt in options if not opt.is_correct]
+            choice = self.rng.choice(correct if not wrong or self.rng.random() < self.p_correct else wrong)
+            self.at.radio[0].set_value(choice.ans)
+            self.click("check", "Check Answer")
+            if not choice.is_correct:
+                self.click("remedial_return", "Return to Main Frame")
+            elif choice.next_step == COMPLETE:
+                return
+            else:
+                self.click("next", "Next")
+
+    def practice(self):
+        self.click("home", "Back to Home")
+        if self.button("Start Practic", "Continue Practic"):
+            self.click("start_practice", "Start Practic", "Continue Practic")
+        else:
+            self.at.session_state.page = "practice"
+            self.run("start_practice")
+        for _ in range(self.practice_answers):
+            # The rerun that masters a concept shows no question; the next one
+            # serves the following concept.  Resetting is for a learner with
+            # every concept mastered.
+            learner = self.at.session_state.learner
+            for _ in range(len(learner.graph)):
+                if self.at.radio or learner.next_concept() is None:
+                    break
+                self.run("practice_rerun")
+            if not self.at.radio and self.button("Practice next concept"):
+                self.click("practice_next", "Practice next concept")
+            if not self.at.radio:
+                return
+            # The practice radio is keyed by question id
+            radio = self.at.radio[0]
+            correct = self.answers.get(radio.key)
+            wrong = [opt for opt in radio.options if opt != correct]
+            right = correct in radio.options and (not wrong or self.rng.random() < self.p_correct)
+            radio.set_value(correct if right else self.rng.choice(wrong))
+            self.click("practice_submit", "Submit")
+
+    def logout(self):
+        # Only the frame page has a Logout button
+        if self.button("Logout") is None:
+            self.at.session_state.page = "frame"
+            self.run("open_frame")
+        self.click("logout", "Logout")
+
+    def journey(self):
+        self.login()
+        self.frames()
+        self.practice()
+
+
+def run_student(script, name, graph, answers, seed, args):
+    student = Student(
+        script, name, graph, answers, random.Random(seed), args.p_correct, args.practice_answers, args.timeout
+    )
+    error = None
+    try:
+        student.journey()
+    except JourneyError as e:
+        error = (e.step, str(e))
+    except Exception as e:
+        error = ("harness", f"{type(e).__name__}: {e}")
+    return student, error
+
+
+# -------------------- Worker -------------------- #
+def run_worker(worker, args):
+    # One process: args.threads students at a time, all of them kept open
+    # until the end so the RSS growth can be divided among them.  A warm-up
+    # student first pays for imports and the process-wide caches.
+    from concurrent.futures import ThreadPoolExecutor
+
+    script = os.path.abspath(args.script)
+    graph = FrameGraph(load_frames(args.content))
+    # Correct answers of both banks; their question ids do not overlap
+    answers = {
+        q["question_id"]: q["correct_answer"]
+        for path in (QUESTION_BANK_PATH, ADAPTIVE_QUESTION_BANK_PATH)
+        for q in load_question_bank(path)
+    }
+    students = range(worker, args.students, args.processes)
+    run_student(script, f"load-{args.run_id}-warmup-{worker}", graph, answers, args.seed - 1 - worker, args)
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        results = list(pool.map(
+            lambda i: run_student(script, f"load-{args.run_id}-{i}", graph, answers, args.seed + i, args), students,
+        ))
+    elapsed = time.perf_counter() - started
+    rss_after = rss_bytes()
+    errors = []
+    for student, error in results:
+        if error is None:
+            try:
+                student.logout()
+            except JourneyError as e:
+                error = (e.step, str(e))
+        if error:
+            errors.append(error)
+    return {
+        "timings": [t for student, _ in results for t in student.timings],
+        "waits": [w for student, _ in results for w in student.waits],
+        "errors": errors,
+        "journeys": len(results),
+        "elapsed": elapsed,
+        "rss_per_session": (rss_after - rss_before) / max(len(results), 1),
+    }
+
+
+# -------------------- Report -------------------- #
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def report(results, args):
+    by_step = defaultdict(list)
+    for step, seconds in (t for r in results for t in r["timings"]):
+        by_step[step].append(seconds)
+    all_reruns = sorted(s for values in by_step.values() for s in values)
+    journeys = sum(r["journeys"] for r in results)
+    errors = [e for r in results for e in r["errors"]]
+    wall = max(r["elapsed"] for r in results)
+
+    print(f"{args.script}: {journeys} students, {args.processes} process(es) x {args.threads} thread(s), {wall:.1f} s")
+    header = f"{'step':<18}{'reruns':>8}" + "".join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+    print(header)
+    order = ["load", "login", "start_frames", "review", "check", "remedial_return", "next", "home",
+             "start_practice", "practice_submit", "practice_rerun", "practice_next", "open_frame", "logout"]
+    for step in sorted(by_step, key=lambda s: order.index(s) if s in order else len(order)):
+        values = sorted(by_step[step])
+        print(f"{step:<18}{len(values):>8}" + "".join(f"{percentile(values, p) * 1000:>10.1f}" for p in PERCENTILES))
+    print(f"{'all':<18}{len(all_reruns):>8}" + "".join(f"{percentile(all_reruns, p) * 1000:>10.1f}" for p in PERCENTILES))
+    # Time spent queued for the process's rerun lock, not part of the reruns above
+    waits = sorted(w for r in results for w in r["waits"])
+    print(f"{'lock wait':<18}{len(waits):>8}" + "".join(f"{percentile(waits, p) * 1000:>10.1f}" for p in PERCENTILES))
+    print(f"throughput: {len(all_reruns) / wall:.1f} reruns/s")
+    print(f"errors: {len(errors)} / {journeys} journeys ({len(errors) / max(journeys, 1):.1%})")
+    for step, message in sorted(set(errors))[:10]:
+        print(f"  {message}")
+    per_session = statistics.mean(r["rss_per_session"] for r in results)
+    print(f"memory: {per_session / 1024:.0f} KiB RSS per open session (AppTest's own element tree included)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("script", nargs="?", default="app.py")
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=4, help="concurrent sessions per process")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes sharing one event store")
+    parser.add_argument("--p-correct", type=float, default=0.6, help="chance of answering a frame or question correctly")
+    parser.add_argument("--practice-answers", type=int, default=5)
+    parser.add_argument("--content", default=CONTENT_PATH)
+    parser.add_argument("--db", help="event store (default: a fresh temporary database)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    args.run_id = f"{int(time.time()):x}"
+
+    # Read by event_store at import time, in this process and in the workers
+    os.environ["BPI_EVENT_DB"] = args.db or os.path.join(tempfile.mkdtemp(prefix="bpi-load-"), "events.sqlite3")
+    if args.processes > 1:
+        with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+            results = pool.starmap(run_worker, [(worker, args) for worker in range(args.processes)])
+    else:
+        results = [run_worker(0, args)]
+    report(results, args)
+    print(f"events: {os.environ['BPI_EVENT_DB']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Practice content
+#
+# The knowledge graph and question bank behind the practice pages are JSON
+# data files, versioned in their names like the redirection map:
+#   knowledge_graph_v2.json   concept -> {"prerequisite": [...], "bloom_levels": [...]}
+#   knowledge_graph_v1.json   the earlier seven-concept graph ap.py still uses
+#   question_bank_v1.json     questions Q1..Q11 (app.py, ap.py)
+#   question_bank_v2.json     the same questions under the Q<n>.<m> ids that
+#                             adaptive_redirection_map_v2.json serves
+# They are checked and frozen when loaded (lists become tuples, mappings
+# read-only), so the one copy a process loads (see load_concept_graph() /
+# load_question_index() in the scripts) can be shared by every page and
+# session.  Editing content means a new or changed data file, not Python.
+import json
+import os
+from types import MappingProxyType
+
+KNOWLEDGE_GRAPH_PATH = os.environ.get("BPI_KNOWLEDGE_GRAPH", "knowledge_graph_v2.json")
+QUESTION_BANK_PATH = os.environ.get("BPI_QUESTION_BANK", "question_bank_v1.json")
+ADAPTIVE_QUESTION_BANK_PATH = os.environ.get("BPI_ADAPTIVE_QUESTION_BANK", "question_bank_v2.json")
+PROTOTYPE_KNOWLEDGE_GRAPH_PATH = os.environ.get("BPI_PROTOTYPE_KNOWLEDGE_GRAPH", "knowledge_graph_v1.json")
+
+QUESTION_FIELDS = ("question_id", "text", "options", "correct_answer", "bloom_level", "concept_tag")
+
+
+class PracticeContentError(ValueError):
+    pass
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def freeze_knowledge_graph(raw):
+    if not isinstance(raw, dict):
+        raise PracticeContentError("knowledge graph must be a JSON object of concepts")
+    graph = {}
+    for concept, data in raw.items():
+        if not isinstance(data, dict) or not isinstance(data.get("bloom_levels"), list) or not data["bloom_levels"]:
+            raise PracticeContentError(f"'{concept}' needs a non-empty bloom_levels list")
+        graph[concept] = MappingProxyType({
+            "prerequisite": tuple(data.get("prerequisite", ())),
+            "bloom_levels": tuple(data["bloom_levels"]),
+        })
+    return MappingProxyType(graph)
+
+
+def freeze_question_bank(raw, knowledge_graph=None):
+    # With knowledge_graph, questions the engine could never serve (unknown
+    # concept, or a Bloom level the concept does not have) are errors too
+    if not isinstance(raw, list):
+        raise PracticeContentError("question bank must be a JSON list of questions")
+    bank = []
+    seen = set()
+    for i, q in enumerate(raw):
+        missing = [field for field in QUESTION_FIELDS if field not in q]
+        if missing:
+            raise PracticeContentError(f"question {i + 1} is missing {', '.join(missing)}")
+        question_id = q["question_id"]
+        if question_id in seen:
+            raise PracticeContentError(f"duplicate question id '{question_id}'")
+        seen.add(question_id)
+        if q["correct_answer"] not in q["options"]:
+            raise PracticeContentError(f"{question_id}: correct answer is not one of its options")
+        if knowledge_graph is not None:
+            concept = knowledge_graph.get(q["concept_tag"])
+            if concept is None:
+                raise PracticeContentError(f"{question_id}: unknown concept '{q['concept_tag']}'")
+            if q["bloom_level"] not in concept["bloom_levels"]:
+                raise PracticeContentError(
+                    f"{question_id}: '{q['concept_tag']}' has no Bloom level '{q['bloom_level']}'"
+                )
+        bank.append(MappingProxyType({**q, "options": tuple(q["options"])}))
+    return tuple(bank)
+
+
+def load_knowledge_graph(path=KNOWLEDGE_GRAPH_PATH):
+    return freeze_knowledge_graph(_read(path))
+
+
+def load_question_bank(path=QUESTION_BANK_PATH, knowledge_graph=None):
+    return freeze_question_bank(_read(path), knowledge_graph)
@@ -0,0 +1,55 @@
+# Answer feedback for the practice pages
+#
+# The submit handler only records what to show and reruns straight away; the
+# next render plays the balloons/snow, the messages and the "next question"
+# countdown.  The countdown is a CSS animation in the browser, so no script
+# thread is held while the learner reads the feedback.
+import streamlit as st
+
+COUNTDOWN_SECONDS = 3
+
+_COUNTDOWN_HTML = """
+<style>
+@keyframes bpi-countdown-fill {{ from {{ width: 0; }} to {{ width: 100%; }} }}
+@keyframes bpi-countdown-count {{
+  0% {{ content: "3"; }} 33.3% {{ content: "2"; }} 66.6% {{ content: "1"; }} 100% {{ content: "0"; }}
+}}
+@keyframes bpi-countdown-hide {{ to {{ height: 0; opacity: 0; margin: 0; }} }}
+.bpi-countdown {{ overflow: hidden; animation: bpi-countdown-hide 0.3s {seconds}s forwards; }}
+.bpi-countdown .count::before {{ content: "0"; animation: bpi-countdown-count {seconds}s steps(1) forwards; }}
+.bpi-countdown .track {{ background: #eee; border-radius: 4px; height: 8px; margin: 6px 0 2px; }}
+.bpi-countdown .fill {{ background: {color}; border-radius: 4px; height: 8px;
+                        animation: bpi-countdown-fill {seconds}s linear forwards; }}
+</style>
+<div class="bpi-countdown">
+  <h4>⏳ Next question in <span class="count"></span> seconds...</h4>
+  <div class="track"><div class="fill"></div></div>
+  <small>Progress {mark}</small>
+</div>
+"""
+
+
+def start_feedback(is_correct):
+    # Returns the message list the submit handler appends (kind, text) pairs to
+    st.session_state.practice_feedback = {"correct": is_correct, "messages": []}
+    return st.session_state.practice_feedback["messages"]
+
+
+def show_feedback():
+    feedback = st.session_state.pop("practice_feedback", None)
+    if not feedback:
+        return
+    if feedback["correct"]:
+        st.balloons()
+    else:
+        st.snow()
+    for kind, text in feedback["messages"]:
+        getattr(st, kind)(text)
+    st.markdown(
+        _COUNTDOWN_HTML.format(
+            seconds=COUNTDOWN_SECONDS,
+            color="#21c354" if feedback["correct"] else "#ff4b4b",
+            mark="✅" if feedback["correct"] else "❌",
+        ),
+        unsafe_allow_html=True,
+    )
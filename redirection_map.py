@@ -0,0 +1,98 @@
+# Adaptive redirection map
+#
+# adaptive_redirection_map_v2.json says what follows a correct or incorrect
+# answer to each question, keyed by the question text:
+#   "Serve Q1.2" | "Go to teaching support" | "Proceed to next concept ..."
+# The file is parsed once, checked against the question bank and compiled
+# into a table of typed actions keyed by question id.  Edits to the file are
+# rebuilt and swapped in by a ContentWatcher thread (see content_watcher.py).
+import json
+import re
+from typing import NamedTuple, Optional
+
+from content_watcher import ContentWatcher
+
+REDIRECTION_MAP_PATH = "adaptive_redirection_map_v2.json"
+RELOAD_INTERVAL = 2.0
+
+SERVE = "serve"
+TEACHING_SUPPORT = "teaching_support"
+NEXT_CONCEPT = "next_concept"
+
+
+class RedirectionMapError(ValueError):
+    pass
+
+
+class RedirectAction(NamedTuple):
+    kind: str
+    question_id: Optional[str] = None
+
+
+class Redirect(NamedTuple):
+    if_correct: Optional[RedirectAction] = None
+    if_incorrect: Optional[RedirectAction] = None
+
+
+NO_REDIRECT = Redirect()
+
+_ACTION_PATTERNS = (
+    (re.compile(r"serve\s+\(?\s*([^\s()]+)\s*\)?", re.IGNORECASE), SERVE),
+    (re.compile(r"go to teaching support", re.IGNORECASE), TEACHING_SUPPORT),
+    (re.compile(r"proceed to next concept\b.*", re.IGNORECASE), NEXT_CONCEPT),
+)
+
+
+def parse_action(raw):
+    text = str(raw).strip()
+    for pattern, kind in _ACTION_PATTERNS:
+        match = pattern.fullmatch(text)
+        if match:
+            return RedirectAction(kind, match.group(1) if kind == SERVE else None)
+    raise RedirectionMapError(f"unknown redirect action {raw!r}")
+
+
+def compile_redirection_map(raw, question_index):
+    if not isinstance(raw, dict):
+        raise RedirectionMapError("redirection map must be a JSON object")
+    ids_by_text = {q["text"]: q["question_id"] for q in question_index.questions}
+    table = {}
+    for text, outcomes in raw.items():
+        question_id = ids_by_text.get(text)
+        if question_id is None:
+            raise RedirectionMapError(f"no question in the bank with text {text!r}")
+        actions = {}
+        for outcome in Redirect._fields:
+            if outcome not in outcomes:
+                continue
+            try:
+                action = parse_action(outcomes[outcome])
+            except RedirectionMapError as e:
+                raise RedirectionMapError(f"{question_id}.{outcome}: {e}") from None
+            if action.kind == SERVE and action.question_id not in question_index.by_id:
+                raise RedirectionMapError(f"{question_id}.{outcome}: unknown question '{action.question_id}'")
+            actions[outcome] = action
+        table[question_id] = Redirect(**actions)
+    return table
+
+
+def load_redirection_map(question_index, path=REDIRECTION_MAP_PATH):
+    with open(path, encoding="utf-8") as f:
+        return compile_redirection_map(json.load(f), question_index)
+
+
+# Shared by every session in a process.  A broken edit keeps the last good
+# table (see last_error); the file is only required to be valid at startup.
+class RedirectionMap(ContentWatcher):
+    def __init__(self, question_index, path=REDIRECTION_MAP_PATH, interval=RELOAD_INTERVAL):
+        self.path = path
+        self.question_index = question_index
+        super().__init__(
+            [path], lambda: load_redirection_map(question_index, path), interval, name="redirection-map-watcher"
+        )
+
+    def get(self, question_id):
+        return self.current.get(question_id, NO_REDIRECT)
+
+    def __len__(self):
+        return len(self.current)
@@ -0,0 +1,82 @@
+# Multi-worker launcher
+#
+# Starts N Streamlit processes for one script on consecutive ports, all
+# pointed at the same data directory: the compiled content bundle is built
+# once up front and read by every worker instead of the workbook, and events
+# and session snapshots go to one SQLite database in WAL mode.  Any worker can
+# rebuild any learner's session (see resume_from_url() in the scripts), so
+# the workers can sit behind a plain round-robin load balancer.
+#
+#   python serve_workers.py --workers 4 --port 8501 --data-dir /srv/bpi app.py
+import argparse
+import os
+import secrets
+import signal
+import subprocess
+import sys
+
+from content_bundle import CONTENT_PATH, bundle_path, compile_bundle, content_hash, write_bundle
+
+
+def prepare(data_dir, content=CONTENT_PATH):
+    os.makedirs(data_dir, exist_ok=True)
+    cache_dir = os.path.join(data_dir, "content_cache")
+    event_db = os.path.join(data_dir, "bpi_events.sqlite3")
+
+    # Built here rather than by whichever worker starts first
+    digest = content_hash(content)
+    out = bundle_path(content, digest, cache_dir)
+    if not os.path.exists(out):
+        write_bundle(compile_bundle(content, digest), out)
+
+    # Schema creation and the progress backfill run once, not in every worker
+    from event_store import EventStore
+    EventStore(event_db)
+    return cache_dir, event_db
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("script", nargs="?", default="app.py")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=8501, help="port of the first worker")
+    parser.add_argument("--data-dir", default=os.environ.get("BPI_DATA_DIR", "data"))
+    parser.add_argument("--content", default=CONTENT_PATH)
+    parser.add_argument("--metrics-port", type=int, help="metrics endpoint of the first worker (see instrumentation.py)")
+    args = parser.parse_args()
+
+    cache_dir, event_db = prepare(args.data_dir, args.content)
+    env = dict(
+        os.environ,
+        BPI_CONTENT_CACHE=os.path.abspath(cache_dir),
+        BPI_EVENT_DB=os.path.abspath(event_db),
+        # Same secret everywhere so XSRF tokens issued by one worker pass on another
+        STREAMLIT_SERVER_COOKIE_SECRET=os.environ.get("STREAMLIT_SERVER_COOKIE_SECRET", secrets.token_hex(32)),
+    )
+
+    workers = []
+    for i in range(args.workers):
+        port = args.port + i
+        worker_env = env
+        if args.metrics_port:
+            worker_env = dict(env, BPI_METRICS_PORT=str(args.metrics_port + i))
+        workers.append(subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", args.script,
+             "--server.port", str(port), "--server.headless", "true"],
+            env=worker_env,
+        ))
+        print(f"worker {i + 1}: http://localhost:{port}"
+              + (f"  metrics: http://localhost:{args.metrics_port + i}/metrics" if args.metrics_port else ""))
+
+    def stop(signum, frame):
+        for worker in workers:
+            worker.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker in workers:
+        worker.wait()
+
+
+if __name__ == "__main__":
+    main()
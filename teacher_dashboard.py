@@ -0,0 +1,114 @@
+# Teacher dashboard
+#
+# Whole-class view built from the event store's class aggregates
+# (EventStore.class_stats()).  Those are a few rows per frame, concept and
+# question, kept up to date by every event batch, so the page costs the same
+# for a class of 30 or 30,000.  Set BPI_TEACHER_PASSWORD to put it behind a
+# password.
+import os
+
+import pandas as pd
+import streamlit as st
+
+from instrumentation import timed
+
+TEACHER_PASSWORD = os.environ.get("BPI_TEACHER_PASSWORD")
+
+
+def _unlocked():
+    if not TEACHER_PASSWORD or st.session_state.get("teacher"):
+        return True
+    with st.form("teacher_login"):
+        password = st.text_input("Teacher password", type="password")
+        if st.form_submit_button("Open dashboard"):
+            if password == TEACHER_PASSWORD:
+                st.session_state.teacher = True
+                st.rerun()
+            st.error("Wrong password.")
+    return False
+
+
+def frame_funnel(stats, frames):
+    main_frames = frames[frames["source"] == "Main_frame"].index
+    rows = [("Logged in", stats.learners, stats.learners, None)]
+    for frame in main_frames:
+        responses, correct, reached, completed = stats.frames.get(frame, (0, 0, 0, 0))
+        rows.append((frame, reached, completed, correct / responses if responses else None))
+    return pd.DataFrame(rows, columns=["stage", "reached", "completed", "success_rate"]).set_index("stage")
+
+
+def remedial_frame_hits(stats, frames):
+    rows = []
+    for frame, answer, hits in stats.remedial_hits:
+        options = frames.at[frame, "options"] if frame in frames.index else None
+        remedial = next((opt.next_step for opt in options or () if opt.ans == answer), None)
+        rows.append((remedial, frame, answer, hits))
+    return pd.DataFrame(rows, columns=["remedial_frame", "from_frame", "answer", "hits"])
+
+
+def concept_mastery(stats, concept_graph):
+    mastered = [stats.concepts.get(concept, 0) for concept in concept_graph.concepts]
+    df = pd.DataFrame({"mastered": mastered}, index=pd.Index(concept_graph.concepts, name="concept"))
+    df["share"] = df["mastered"] / stats.learners if stats.learners else 0.0
+    return df
+
+
+def question_p_values(stats, question_index):
+    # Classical item difficulty: the share of answers that were correct
+    rows = []
+    for q in question_index.questions:
+        answers, correct = stats.questions.get(q["question_id"], (0, 0))
+        rows.append((
+            q["question_id"], q["concept_tag"], q["bloom_level"], q["text"], answers,
+            correct / answers if answers else None,
+        ))
+    df = pd.DataFrame(rows, columns=["question_id", "concept", "bloom_level", "question", "answers", "p_value"])
+    return df.sort_values("p_value", na_position="last", ignore_index=True)
+
+
+@timed()
+def show_teacher_dashboard(db, frames, concept_graph, question_index, content_errors=()):
+    # content_errors: content updates that failed validation and were not served
+    st.title("📊 Teacher Dashboard")
+    if st.button("🔙 Back to Login"):
+        st.session_state.page = "login"
+        st.rerun()
+    if not _unlocked():
+        return
+
+    for error in content_errors:
+        st.error(f"A content update was rejected and the previous version is still being served: {error}")
+    if db.dropped:
+        st.error(f"{db.dropped} event(s) could not be stored since this worker started; last error: {db.last_error}")
+
+    stats = db.class_stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Learners", stats.learners)
+    col2.metric("Frame responses", sum(row[0] for row in stats.frames.values()))
+    col3.metric("Practice answers", sum(row[0] for row in stats.questions.values()))
+
+    st.subheader("🪜 Frame completion funnel")
+    funnel = frame_funnel(stats, frames)
+    st.bar_chart(funnel[["reached", "completed"]], stack=False)
+    st.dataframe(funnel)
+
+    st.subheader("🔁 Remedial frame hits")
+    hits = remedial_frame_hits(stats, frames)
+    if hits.empty:
+        st.info("No remedial detours yet.")
+    else:
+        st.dataframe(hits, hide_index=True)
+
+    st.subheader("🧠 Concept mastery")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("Learners who have mastered each concept")
+        st.bar_chart(concept_mastery(stats, concept_graph)["mastered"])
+    with col2:
+        st.markdown("Learners by number of concepts mastered")
+        histogram = pd.Series(stats.mastery_histogram, name="learners", dtype="int64")
+        histogram.index.name = "concepts mastered"
+        st.bar_chart(histogram)
+
+    st.subheader("❓ Question p-values (hardest first)")
+    st.dataframe(question_p_values(stats, question_index), hide_index=True)
@@ -0,0 +1,5 @@
+# The modules are flat files at the repository root
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
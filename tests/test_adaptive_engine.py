@@ -0,0 +1,137 @@
+import random
+
+import pytest
+
+from adaptive_engine import (
+    ConceptFrontier, ConceptGraph, FrameLog, KnowledgeGraphError, LearnerState, QuestionIndex,
+    apply_answer, choose_question,
+)
+from practice_content import (
+    ADAPTIVE_QUESTION_BANK_PATH, KNOWLEDGE_GRAPH_PATH, load_knowledge_graph, load_question_bank,
+)
+
+# d needs b and c, which both need a; e stands alone
+SMALL_GRAPH = {
+    "d": {"prerequisite": ["b", "c"], "bloom_levels": ["Remembering"]},
+    "b": {"prerequisite": ["a"], "bloom_levels": ["Remembering"]},
+    "a": {"prerequisite": [], "bloom_levels": ["Remembering"]},
+    "c": {"prerequisite": ["a"], "bloom_levels": ["Remembering"]},
+    "e": {"prerequisite": [], "bloom_levels": ["Remembering"]},
+}
+
+
+def _walk(graph, mastered):
+    # The full graph walk the frontier replaces: first eligible concept in declaration order
+    for concept, data in graph.items():
+        if concept not in mastered and all(p in mastered for p in data["prerequisite"]):
+            return concept
+    return None
+
+
+@pytest.fixture(scope="module")
+def content():
+    graph = load_knowledge_graph(KNOWLEDGE_GRAPH_PATH)
+    return ConceptGraph(graph), QuestionIndex(load_question_bank(ADAPTIVE_QUESTION_BANK_PATH, graph))
+
+
+def test_topological_order_breaks_ties_by_declaration_order():
+    assert ConceptGraph(SMALL_GRAPH).topological_order == ["a", "b", "c", "d", "e"]
+
+
+def test_cycles_and_unknown_prerequisites_are_rejected():
+    with pytest.raises(KnowledgeGraphError, match="cycle"):
+        ConceptGraph({
+            "x": {"prerequisite": ["y"], "bloom_levels": ["Remembering"]},
+            "y": {"prerequisite": ["x"], "bloom_levels": ["Remembering"]},
+        })
+    with pytest.raises(KnowledgeGraphError, match="unknown prerequisite"):
+        ConceptGraph({"x": {"prerequisite": ["z"], "bloom_levels": ["Remembering"]}})
+
+
+def test_frontier_follows_the_graph_walk():
+    frontier = ConceptFrontier(ConceptGraph(SMALL_GRAPH))
+    mastered = set()
+    rng = random.Random(1)
+    for _ in range(200):
+        assert frontier.next_concept() == _walk(SMALL_GRAPH, mastered)
+        assert set(frontier.eligible()) == {
+            c for c, data in SMALL_GRAPH.items()
+            if c not in mastered and all(p in mastered for p in data["prerequisite"])
+        }
+        concept = rng.choice(list(SMALL_GRAPH))
+        if concept in mastered and rng.random() < 0.5:
+            frontier.reset(concept)
+            mastered.discard(concept)
+        elif concept not in mastered:
+            frontier.master(concept)
+            mastered.add(concept)
+
+
+def test_frontier_starts_from_mastered_concepts():
+    frontier = ConceptFrontier(ConceptGraph(SMALL_GRAPH), mastered=["a", "b"])
+    assert frontier.next_concept() == "c"
+    frontier.master("c")
+    assert frontier.next_concept() == "d"
+
+
+def _practice(state, answers, seed=0):
+    rng = random.Random(seed)
+    for _ in range(answers):
+        question = choose_question(state)
+        if question is None:
+            if state.next_concept() is None:
+                break
+            continue
+        is_correct = rng.random() < 0.6
+        answer = question["correct_answer"] if is_correct else next(
+            o for o in question["options"] if o != question["correct_answer"]
+        )
+        state.record_answer(question, answer, is_correct)
+        apply_answer(state, question, is_correct)
+
+
+def test_snapshot_round_trip(content):
+    concept_graph, index = content
+    state = LearnerState(concept_graph, index)
+    _practice(state, 12)
+    restored = LearnerState.from_bytes(concept_graph, index, state.to_bytes())
+
+    assert restored.to_bytes() == state.to_bytes()
+    for concept in concept_graph.concepts:
+        assert restored.level(concept) == state.level(concept)
+        assert restored.attempt_count(concept) == state.attempt_count(concept)
+        assert restored.is_mastered(concept) == state.is_mastered(concept)
+    assert list(restored.history_entries()) == list(state.history_entries())
+    assert restored.next_concept() == state.next_concept()
+    assert choose_question(restored) == choose_question(state)
+
+
+def test_snapshot_is_refused_by_other_content(content):
+    concept_graph, index = content
+    state = LearnerState(concept_graph, index)
+    _practice(state, 5)
+    data = state.to_bytes()
+
+    # Same sizes, different order: positions would point at the wrong entries
+    questions = list(index.questions)
+    questions[0], questions[1] = questions[1], questions[0]
+    with pytest.raises(ValueError):
+        LearnerState.from_bytes(concept_graph, QuestionIndex(questions), data)
+    reordered = dict(reversed(list(concept_graph.graph.items())))
+    with pytest.raises(ValueError):
+        LearnerState.from_bytes(ConceptGraph(reordered), index, data)
+    with pytest.raises(ValueError):
+        LearnerState.from_bytes(concept_graph, index, bytes([1]) + data[1:])
+    with pytest.raises(ValueError):
+        LearnerState.from_bytes(concept_graph, index, data[:-1])
+
+
+def test_frame_log_round_trip_and_fingerprint():
+    log = FrameLog(["main_frame_1", "main_frame_2", "remedial_frame_1"])
+    log.complete("main_frame_2")
+    log.complete("main_frame_2")
+    restored = FrameLog.from_bytes(["main_frame_1", "main_frame_2", "remedial_frame_1"], log.to_bytes())
+    assert restored.is_completed("main_frame_2") and not restored.is_completed("main_frame_1")
+    assert restored.to_bytes() == log.to_bytes()
+    with pytest.raises(ValueError):
+        FrameLog.from_bytes(["main_frame_2", "main_frame_1", "remedial_frame_1"], log.to_bytes())
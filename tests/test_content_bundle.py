@@ -0,0 +1,92 @@
+import json
+
+import pandas as pd
+import pytest
+
+from content_bundle import (
+    COMPLETE, CONTENT_PATH, ContentError, FrameOption, bundle_to_frame, compile_bundle, frame_problems,
+    load_frames, parse_option, read_bundle, validate_frames, write_bundle,
+)
+
+
+def _option(ans, result, next_step):
+    return FrameOption(ans, result, next_step, f"{ans} feedback")
+
+
+def _frames(options):
+    # options: frame -> tuple of FrameOption for main frames, None for remedial ones
+    return pd.DataFrame(
+        {
+            "source": ["Main_frame" if opts is not None else "Remedial_frame" for opts in options.values()],
+            "options": list(options.values()),
+        },
+        index=pd.Index(list(options), name="frame_name"),
+    )
+
+
+def _lesson(**changes):
+    options = {
+        "main_frame_1": (_option("a", "Correct", "main_frame_2"), _option("b", "Incorrect", "remedial_frame_1")),
+        "main_frame_2": (_option("a", "Correct", COMPLETE), _option("b", "Incorrect", "remedial_frame_2")),
+        "remedial_frame_1": None,
+        "remedial_frame_2": None,
+    }
+    options.update(changes)
+    return _frames(options)
+
+
+def test_parse_option():
+    assert parse_option('{ans: "Cells", result: Correct, next_step: main_frame_2, feedback: "Yes"}') == \
+        FrameOption("Cells", "Correct", "main_frame_2", "Yes")
+    with pytest.raises(ContentError, match="missing 'next_step'"):
+        parse_option("ans: Cells, result: Correct, feedback: Yes")
+    with pytest.raises(ContentError, match="result must be one of"):
+        parse_option("ans: Cells, result: Maybe, next_step: main_frame_2, feedback: Yes")
+
+
+def test_valid_lesson_has_no_problems():
+    assert frame_problems(_lesson()) == []
+
+
+@pytest.mark.parametrize("changes, problem", [
+    ({"main_frame_2": (_option("a", "Correct", "main_frame_9"), _option("b", "Incorrect", "remedial_frame_2"))},
+     "leads to 'main_frame_9', which is not a main frame"),
+    ({"main_frame_2": (_option("a", "Correct", COMPLETE), _option("b", "Incorrect", "remedial_frame_9"))},
+     "leads to 'remedial_frame_9', which is not a remedial frame"),
+    ({"main_frame_2": (_option("a", "Correct", COMPLETE), _option("b", "Incorrect", "main_frame_1"))},
+     "leads to 'main_frame_1', which is not a remedial frame"),
+    ({"lesson_3": (_option("a", "Correct", COMPLETE), _option("b", "Incorrect", "remedial_frame_1"))},
+     "cannot return to 'main_frame_3'"),
+])
+def test_broken_branches_are_reported(changes, problem):
+    problems = frame_problems(_lesson(**changes))
+    assert any(problem in p for p in problems), problems
+    with pytest.raises(ContentError):
+        validate_frames(_lesson(**changes))
+
+
+def test_missing_start_and_duplicate_frames():
+    df = _lesson()
+    assert frame_problems(df, start="main_frame_0") == ["start frame 'main_frame_0' is missing"]
+    assert "frame 'main_frame_1' is defined more than once" in frame_problems(pd.concat([df, df.iloc[:1]]))
+
+
+def test_bundle_round_trip(tmp_path):
+    bundle = compile_bundle(CONTENT_PATH)
+    out = tmp_path / "branching_content-0000.bundle.json"
+    write_bundle(bundle, str(out))
+    # Plain JSON: option tuples come back as lists
+    assert read_bundle(str(out)) == json.loads(json.dumps(bundle))
+
+    df = bundle_to_frame(read_bundle(str(out)))
+    assert validate_frames(df) is df
+    expected = load_frames(CONTENT_PATH)
+    assert list(df.index) == list(expected.index)
+    assert df["options"].dropna().to_dict() == expected["options"].dropna().to_dict()
+
+
+def test_read_bundle_refuses_non_bundles(tmp_path):
+    path = tmp_path / "x.bundle.json"
+    path.write_text("[1, 2]")
+    with pytest.raises(ValueError):
+        read_bundle(str(path))
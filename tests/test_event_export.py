@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+import event_export
+from event_export import compact, export, exported_up_to, load_events
+from event_store import EventStore
+
+
+def _log(store, count, day, start=0):
+    for i in range(start, start + count):
+        store.insert({
+            "event": "response", "name": f"learner-{i % 3}", "frame": "main_frame_1",
+            "selected_answer": "a", "result": "Correct", "timestamp": f"{day}T10:00:{i % 60:02d}",
+        })
+
+
+def _ids(out_dir):
+    return sorted(load_events(out_dir, columns=["id"])["id"].to_pylist())
+
+
+def _files(out_dir, day):
+    return sorted(os.listdir(os.path.join(out_dir, f"day={day}")))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore(str(tmp_path / "events.sqlite3"))
+
+
+def test_export_is_incremental_and_compact_merges_a_day(store, tmp_path):
+    out = str(tmp_path / "analytics")
+    for run in range(3):
+        _log(store, 5, "2025-01-01", start=5 * run)
+        assert export(store, out) == 5
+    _log(store, 2, "2025-01-02", start=15)
+    assert export(store, out) == 2
+    assert export(store, out) == 0
+    assert exported_up_to(out) == 17
+
+    assert compact(out) == ["2025-01-01"]
+    assert _files(out, "2025-01-01") == ["part-000000000001-000000000015.parquet"]
+    assert _ids(out) == list(range(1, 18))
+
+
+def test_compaction_cut_short_is_finished_without_duplicates(store, tmp_path, monkeypatch):
+    out = str(tmp_path / "analytics")
+    for run in range(3):
+        _log(store, 4, "2025-01-01", start=4 * run)
+        export(store, out)
+
+    # Crash after the first old part has been removed
+    remove = os.remove
+    removed = []
+
+    def crash(path):
+        if removed:
+            raise KeyboardInterrupt
+        removed.append(path)
+        remove(path)
+
+    monkeypatch.setattr(event_export.os, "remove", crash)
+    with pytest.raises(KeyboardInterrupt):
+        compact(out)
+    monkeypatch.setattr(event_export.os, "remove", remove)
+
+    assert "_compacting-part-000000000001-000000000012.parquet" in _files(out, "2025-01-01")
+    ids = _ids(out)
+    assert len(ids) == len(set(ids))
+
+    # The next export finishes the compaction before picking up new events
+    _log(store, 2, "2025-01-01", start=12)
+    assert export(store, out) == 2
+    assert _files(out, "2025-01-01") == [
+        "part-000000000001-000000000012.parquet", "part-000000000013-000000000014.parquet",
+    ]
+    assert _ids(out) == list(range(1, 15))
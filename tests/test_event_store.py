@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+from event_store import AGGREGATE_TABLES, EventStore, LearnerProgress
+
+
+def _events():
+    # Two learners: responses (correct and wrong), practice answers, mastery
+    # gained and lost, and a practice reset
+    t = "2025-01-01T00:00:00"
+    yield {"event": "login", "name": "ada", "timestamp": t}
+    yield {"event": "response", "name": "ada", "frame": "main_frame_1", "selected_answer": "x", "result": "Incorrect", "timestamp": t}
+    yield {"event": "response", "name": "ada", "frame": "main_frame_1", "selected_answer": "y", "result": "Correct", "timestamp": t}
+    yield {"event": "response", "name": "ada", "frame": "main_frame_1", "selected_answer": "y", "result": "Correct", "timestamp": t}
+    yield {"event": "response", "name": "ada", "frame": "main_frame_2", "selected_answer": "z", "result": "Correct", "timestamp": t}
+    yield {"event": "practice", "name": "ada", "question_id": "Q1", "concept": "A", "answer": "a", "correct": True, "timestamp": t}
+    yield {"event": "mastery", "name": "ada", "concept": "A", "mastered": True, "timestamp": t}
+    yield {"event": "mastery", "name": "ada", "concept": "B", "mastered": True, "timestamp": t}
+    yield {"event": "mastery", "name": "ada", "concept": "B", "mastered": False, "timestamp": t}
+    yield {"event": "login", "name": "bo", "timestamp": t}
+    yield {"event": "response", "name": "bo", "frame": "main_frame_1", "selected_answer": "x", "result": "Incorrect", "timestamp": t}
+    yield {"event": "practice", "name": "bo", "question_id": "Q1", "concept": "A", "answer": "b", "correct": False, "timestamp": t}
+    yield {"event": "practice", "name": "bo", "question_id": "Q2", "concept": "B", "answer": "c", "correct": True, "timestamp": t}
+    yield {"event": "mastery", "name": "bo", "concept": "A", "mastered": True, "timestamp": t}
+    yield {"event": "practice_reset", "name": "bo", "timestamp": t}
+    yield {"event": "practice", "name": "bo", "question_id": "Q1", "concept": "A", "answer": "a", "correct": True, "timestamp": t}
+
+
+def _aggregates(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall()) for table in AGGREGATE_TABLES}
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EventStore(str(tmp_path / "events.sqlite3"))
+
+
+def test_incremental_aggregates_match_a_rebuild_from_the_log(store):
+    for doc in _events():
+        store.insert(doc)
+    assert store.flush()
+    incremental = _aggregates(store.path)
+
+    conn = sqlite3.connect(store.path)
+    conn.execute("PRAGMA user_version = 0")
+    conn.close()
+    EventStore(store.path)
+    assert _aggregates(store.path) == incremental
+
+
+def test_learner_progress(store):
+    for doc in _events():
+        store.insert(doc)
+    assert store.progress("ada") == LearnerProgress(
+        responses=4, completed_frames=2, practice_answers=1, mastered_concepts=1
+    )
+    # The reset clears bo's practice answers and mastery
+    assert store.progress("bo") == LearnerProgress(
+        responses=1, completed_frames=0, practice_answers=1, mastered_concepts=0
+    )
+    assert store.progress("nobody") == LearnerProgress()
+
+
+def test_class_stats(store):
+    for doc in _events():
+        store.insert(doc)
+    store.flush()
+    stats = store.class_stats()
+    assert stats.learners == 2
+    assert stats.frames["main_frame_1"] == (4, 2, 2, 1)
+    assert stats.remedial_hits == [("main_frame_1", "x", 2)]
+    assert stats.concepts == {"A": 1, "B": 0}
+    assert stats.mastery_histogram == {0: 1, 1: 1}
+    assert stats.questions == {"Q1": (3, 2), "Q2": (1, 1)}
+
+
+def test_practice_history_covers_the_current_round(store):
+    for doc in _events():
+        store.insert(doc)
+    page = store.practice_history("bo")
+    assert page.total == 1 and [d["question_id"] for d in page.entries] == ["Q1"]
+
+    page = store.practice_history("ada", correct=False)
+    assert page == (page.entries, 0) and page.entries == []
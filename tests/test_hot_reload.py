@@ -0,0 +1,87 @@
+import glob
+import os
+import shutil
+import time
+
+import openpyxl
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from adaptive_engine import FrameLog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "adaptive_practice_adaptive_logic_applied.py")
+CORRECT = "It shows movement and growth"
+
+
+def test_rebase_keeps_the_progress_of_shared_frames():
+    log = FrameLog(["main_frame_1", "main_frame_2"])
+    log.complete("main_frame_2")
+    assert log.rebase(["main_frame_1", "main_frame_2"]) is log
+
+    rebased = log.rebase(["main_frame_1", "main_frame_3", "main_frame_2"])
+    rebased.complete("main_frame_3")
+    assert rebased.is_completed("main_frame_2") and rebased.is_completed("main_frame_3")
+    assert not rebased.is_completed("main_frame_1")
+
+
+def _insert_frame(path):
+    # main_frame_1 -> main_frame_3 (new, a copy of main_frame_1) -> main_frame_2
+    wb = openpyxl.load_workbook(path)
+    ws = wb["Main_frame"]
+    first = [cell.value for cell in ws[2]]
+    assert first[0] == "main_frame_1"
+    new = [*first]
+    new[0] = "main_frame_3"
+    for col, value in enumerate(first):
+        if isinstance(value, str) and "main_frame_2" in value:
+            ws.cell(row=2, column=col + 1, value=value.replace("main_frame_2", "main_frame_3"))
+    ws.insert_rows(4)
+    for col, value in enumerate(new):
+        ws.cell(row=4, column=col + 1, value=value)
+    wb.save(path)
+
+
+def _answer_and_next(at):
+    next(b for b in at.button if "Review" in b.label).click().run()
+    at.radio[0].set_value(next(o for o in at.radio[0].options if o.startswith(CORRECT))).run()
+    next(b for b in at.button if "Check Answer" in b.label).click().run()
+    next(b for b in at.button if "Next" in b.label).click().run()
+    assert not at.exception, at.exception
+
+
+@pytest.fixture
+def lesson_dir(tmp_path, monkeypatch):
+    for path in glob.glob(os.path.join(ROOT, "*.json")) + [os.path.join(ROOT, "branching_content.xlsx")]:
+        shutil.copy(path, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()
+    yield tmp_path
+    st.cache_resource.clear()
+
+
+def test_frame_added_by_a_hot_reload_mid_session(lesson_dir):
+    at = AppTest.from_file(SCRIPT, default_timeout=60)
+    at.run()
+    at.text_input[0].input("reload-learner")
+    at.button[0].click().run()
+    at.session_state.page = "frame"
+    at.run()
+    assert at.session_state.current_frame == "main_frame_1"
+
+    # The content watcher picks the edit up within a couple of seconds
+    _insert_frame("branching_content.xlsx")
+    deadline = time.monotonic() + 15
+    while at.session_state.learning_log_version in (None, 1):
+        assert time.monotonic() < deadline, "content was not reloaded"
+        time.sleep(0.25)
+        at.run()
+
+    _answer_and_next(at)
+    assert at.session_state.current_frame == "main_frame_3"
+    # Completing the frame the reload added used to raise KeyError
+    _answer_and_next(at)
+    assert at.session_state.current_frame == "main_frame_2"
+    log = at.session_state.learning_log
+    assert log.is_completed("main_frame_1") and log.is_completed("main_frame_3")
@@ -0,0 +1,34 @@
+import json
+
+from instrumentation import BUCKETS, end_rerun, prometheus_text, snapshot, span, start_rerun, timed
+
+
+def test_spans_feed_histograms_and_the_rerun_overlay():
+    @timed("test.inner")
+    def inner():
+        return 42
+
+    start_rerun()
+    with span("test.outer"):
+        assert inner() == 42
+    total, spans = end_rerun()
+
+    assert total is not None
+    assert [(name, depth) for name, depth, _, _ in spans] == [("test.outer", 0), ("test.inner", 1)]
+    assert all(wall >= 0 and cpu >= 0 for _, _, wall, cpu in spans)
+
+    histograms = snapshot()
+    for name in ("test.outer", "test.inner", "rerun"):
+        wall = histograms[name]["wall"]
+        assert wall["count"] >= 1
+        assert wall["buckets"]["+Inf"] == wall["count"]
+        assert list(wall["buckets"]) == [*BUCKETS, "+Inf"]
+    json.dumps(histograms)
+
+
+def test_spans_outside_a_rerun_are_still_recorded():
+    before = snapshot().get("test.bare", {"wall": {"count": 0}})["wall"]["count"]
+    with span("test.bare"):
+        pass
+    assert snapshot()["test.bare"]["wall"]["count"] == before + 1
+    assert 'bpi_span_wall_seconds_count{span="test.bare"}' in prometheus_text()
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from adaptive_engine import ConceptGraph, FrameLog, LearnerState, QuestionIndex
+from content_bundle import CONTENT_PATH, START_FRAME, load_frames
+from event_store import EventStore
+from frame_graph import FrameGraph
+from learner_sessions import LearnerSessions
+from practice_content import KNOWLEDGE_GRAPH_PATH, QUESTION_BANK_PATH, load_knowledge_graph, load_question_bank
+
+
+class NoSnapshots:
+    # The store as seen by a restore that has to replay the whole log
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def snapshot(self, name):
+        return None
+
+
+@pytest.fixture(scope="module")
+def content():
+    graph = load_knowledge_graph(KNOWLEDGE_GRAPH_PATH)
+    return ConceptGraph(graph), QuestionIndex(load_question_bank(QUESTION_BANK_PATH, graph)), FrameGraph(load_frames(CONTENT_PATH))
+
+
+@pytest.fixture
+def sessions(tmp_path, content):
+    concept_graph, index, frames = content
+    store = EventStore(str(tmp_path / "events.sqlite3"))
+    return (
+        LearnerSessions(store, concept_graph, index, lambda: frames),
+        LearnerSessions(NoSnapshots(store), concept_graph, index, lambda: frames),
+    )
+
+
+def _state(session):
+    return session.current_frame, session.frame_log.to_bytes(), session.learner.to_bytes()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_snapshot_plus_replay_matches_a_full_replay(sessions, content, seed):
+    # Drives the frame page the way a learner does and snapshots at random
+    # points, including between "Check Answer" and "Next"
+    snapshotting, replaying = sessions
+    concept_graph, index, frames = content
+    rng = random.Random(seed)
+    name = f"learner-{seed}"
+    current, log, learner = START_FRAME, FrameLog(frames.frames.index), LearnerState(concept_graph, index)
+    for _ in range(30):
+        option = rng.choice(frames.options[current])
+        snapshotting.store.insert({
+            "event": "response", "name": name, "frame": current, "selected_answer": option.ans,
+            "result": option.result, "timestamp": "2025-01-01T00:00:00",
+        })
+        pending = option.is_correct
+        if rng.random() < 0.5:
+            assert snapshotting.checkpoint(name, current, learner, log, force=True, answered=option if pending else None)
+            assert _state(snapshotting.restore(name)) == _state(replaying.restore(name))
+        if pending and option.next_step not in frames:
+            break
+        if pending:
+            # "Next"
+            log.complete(current)
+            current = option.next_step
+    assert _state(snapshotting.restore(name)) == _state(replaying.restore(name))
+
+
+def test_snapshot_between_check_and_next_resumes_on_the_next_frame(sessions, content):
+    snapshotting, _ = sessions
+    concept_graph, index, frames = content
+    option = next(opt for opt in frames.options[START_FRAME] if opt.is_correct and opt.next_step in frames)
+    snapshotting.store.insert({
+        "event": "response", "name": "ada", "frame": START_FRAME, "selected_answer": option.ans,
+        "result": option.result, "timestamp": "2025-01-01T00:00:00",
+    })
+    log = FrameLog(frames.frames.index)
+    assert snapshotting.checkpoint(
+        "ada", START_FRAME, LearnerState(concept_graph, index), log, force=True, answered=option
+    )
+    assert not log.is_completed(START_FRAME)
+    session = snapshotting.restore("ada")
+    assert session.current_frame == option.next_step
+    assert session.frame_log.is_completed(START_FRAME)